@@ -0,0 +1,285 @@
+# Imports the threading and queue libraries to run mouse actions on a dedicated worker thread
+import threading
+import queue
+# Imports the Future class which is returned to callers so they can wait on, or cancel, a queued action
+from concurrent.futures import Future, CancelledError
+import numpy as np
+
+
+class Action():
+    """
+    Class that stores a single queued mouse action along with the future that reports its result
+    """
+
+
+    def __init__(self, kind, args):
+        """
+        Initializes the Action() class
+
+         Parameters:
+        - kind (str): The type of action to perform, either 'move', 'click', 'drag' or 'scroll'
+        - args (tuple): The arguments that the action will be performed with
+        """
+
+        self.kind = kind
+        self.args = args
+        # Creates the future that is handed back to the caller
+        self.future = Future()
+        # Set when the caller cancels this action while it is already being performed
+        self.cancelled = threading.Event()
+
+
+class ActionQueue():
+    """
+    Class that performs mouse actions on a dedicated worker thread so that the calling thread never blocks
+    while the mouse is moving or clicking. Every queued action returns a future.
+    """
+
+
+    def __init__(self, mouseManager):
+        """
+        Initializes the ActionQueue() class and starts its worker thread
+
+         Parameters:
+        - mouseManager (MouseManager): The mouse manager used to validate coordinates, generate trajectories and perform clicks
+        """
+
+        self.mouse = mouseManager
+        # Creates the queue that the worker thread takes its actions from
+        self._queue = queue.Queue()
+        # Stores the action currently being performed (if any)
+        self._current = None
+        # Guards the move target so it can be replaced while a move is in flight
+        self._lock = threading.Lock()
+        # Stores the target of the move currently being performed
+        self._target = None
+        # Creates and starts the worker thread as a daemon so that it never prevents the application from exiting
+        self._running = True
+        self._worker = threading.Thread(target = self._run, name = 'ActionQueue', daemon = True)
+        self._worker.start()
+
+
+    def move(self, x, y, duration = None):
+        """
+        Queues a movement of the mouse cursor to the passed location
+
+         Parameters:
+        - x, y (ints): The position that the cursor should be moved to
+        - duration (optional float): The time in seconds that the movement should take (default = None, scaled to the distance by Fitts' law)
+
+         Returns:
+        - A future that completes with the target once the cursor has arrived, or raises CancelledError if the move is cancelled
+        """
+
+        return self._put('move', (x, y, duration))
+
+
+    def click(self, x = None, y = None, numClicks = 1, delay = 0.25, button = 'left'):
+        """
+        Queues a click action, see MouseManager.click() for the parameters
+
+         Returns:
+        - A future that completes once the click has been performed
+        """
+
+        return self._put('click', (x, y, numClicks, delay, button))
+
+
+    def drag(self, endX, endY, startX = None, startY = None):
+        """
+        Queues a drag action, see MouseManager.dragTo() for the parameters
+
+         Returns:
+        - A future that completes once the drag has been performed
+        """
+
+        return self._put('drag', (endX, endY, startX, startY))
+
+
+    def scroll(self, scrollAmount, x = None, y = None):
+        """
+        Queues a scroll action, positive amounts scroll up and negative amounts scroll down
+
+         Returns:
+        - A future that completes once the scroll has been performed
+        """
+
+        return self._put('scroll', (scrollAmount, x, y))
+
+
+    def retarget(self, x, y):
+        """
+        Replaces the target of the move currently being performed, if no move is in flight then a new move is queued instead
+
+         Parameters:
+        - x, y (ints): The new position that the cursor should be moved to
+
+         Returns:
+        - The future of the move that will now end at the passed position
+        """
+
+        with self._lock:
+            # If a move is currently being performed, replaces its target so it curves towards the new position
+            if self._current is not None and self._current.kind == 'move' and not self._current.future.done():
+                self._target = (x, y)
+                return self._current.future
+
+        # Else queues a new move to the passed position
+        return self.move(x, y)
+
+
+    def cancel(self, future):
+        """
+        Cancels the action belonging to the passed future, whether it is still queued or is currently being performed
+
+         Returns:
+        - True if the action was cancelled, else returns false
+        """
+
+        # Cancels the action if it has not started yet
+        if future.cancel():
+            return True
+
+        # Else if the action is currently being performed, flags it so that it stops at its next step
+        current = self._current
+        if current is not None and current.future is future and not future.done():
+            current.cancelled.set()
+            return True
+
+        return False
+
+
+    def cancelAll(self):
+        """
+        Cancels every queued action as well as the action currently being performed
+        """
+
+        # Empties the queue and cancels the future of each queued action
+        while True:
+            try:
+                self._queue.get_nowait().future.cancel()
+            except queue.Empty:
+                break
+
+        # Flags the current action so that it stops at its next step
+        if self._current is not None:
+            self._current.cancelled.set()
+
+
+    def pending(self):
+        """
+        Returns the number of actions waiting in the queue
+        """
+
+        return self._queue.qsize()
+
+
+    def stop(self):
+        """
+        Cancels every action and stops the worker thread
+        """
+
+        self.cancelAll()
+        self._running = False
+        # Wakes the worker thread up so that it can exit
+        self._queue.put(None)
+        self._worker.join(timeout = 1)
+
+
+    def _put(self, kind, args):
+        """
+        Creates a new action, queues it for the worker thread and returns its future
+        """
+
+        action = Action(kind, args)
+        self._queue.put(action)
+        return action.future
+
+
+    def _run(self):
+        """
+        Worker thread loop that performs each queued action in order
+        """
+
+        while self._running:
+
+            # Waits for the next action
+            action = self._queue.get()
+
+            # Returns if the queue has been stopped
+            if action is None:
+                return
+
+            # Skips actions that were cancelled while waiting in the queue
+            if not action.future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._current = action
+
+            try:
+                # Performs the action and reports its result through the future
+                action.future.set_result(getattr(self, f'_{action.kind}')(action, *action.args))
+
+            # Reports any errors through the future instead of killing the worker thread
+            except Exception as e:
+                action.future.set_exception(e)
+
+            finally:
+                with self._lock:
+                    self._current = None
+
+
+    def _move(self, action, x, y, duration):
+        """
+        Plays a trajectory towards the target one step at a time so that the move can be cancelled or retargeted while in flight,
+        a move cancelled in flight raises CancelledError so that its future is not mistaken for a completed move
+        """
+
+        with self._lock:
+            self._target = target = (x, y)
+
+        while not action.cancelled.is_set():
+
+            with self._lock:
+                target = self._target
+
+            # Generates a path from the current cursor position to the current target
+            path = self.mouse.trajectory.path(self.mouse.getPos(), target)
+
+            # Stretches the path to the passed duration if one was given, else keeps the Fitts' law duration
+            if duration is not None:
+                samples = max(2, int(duration * self.mouse.trajectory.rate) + 1)
+                steps = np.linspace(0, len(path) - 1, samples)
+                path = np.column_stack([np.interp(steps, np.arange(len(path)), path[:, axis]) for axis in (0, 1)])
+
+            # Plays the path while holding the shared mouse, stopping early if the action is cancelled or its target is replaced
+            with self.mouse.inputLock:
+                if self.mouse.trajectory.play(path, self.mouse.backend.moveTo, shouldStop = lambda: action.cancelled.is_set() or self._target != target):
+                    return target
+
+        # Reports the cancellation through the future, the worker thread sets this error on it
+        raise CancelledError(f'Move to {target} was cancelled in flight')
+
+    def _click(self, action, x, y, numClicks, delay, button):
+        """
+        Performs a click through the mouse manager
+        """
+
+        return self.mouse.click(x, y, numClicks, delay, button)
+
+
+    def _drag(self, action, endX, endY, startX, startY):
+        """
+        Performs a drag through the mouse manager
+        """
+
+        return self.mouse.dragTo(endX, endY, startX, startY)
+
+
+    def _scroll(self, action, scrollAmount, x, y):
+        """
+        Performs a scroll through the mouse manager, which holds the shared mouse while scrolling
+        """
+
+        return self.mouse.scrollUp(scrollAmount, x, y)
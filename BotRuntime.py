@@ -0,0 +1,156 @@
+# Imports the time and threading libraries to pace each tick and to wake the runtime the moment it is stopped
+import time
+import threading
+from collections import deque
+# Imports the QThread class and signals which run the ticks off the GUI thread and report them back to it
+from PyQt5.QtCore import QThread, pyqtSignal
+import numpy as np
+
+
+class BotRuntime(QThread):
+    """
+    Class that runs a bot as a fixed rate loop of ticks on a worker thread, leaving the GUI thread free to render the
+    overlays. Each tick captures a frame, perceives it, decides what to do and then acts:
+
+    - perceive(script): Searches the captured frame and returns what was seen
+    - decide(script, percept): Returns the action to take based on what was seen
+    - act(script, decision): Performs the action, e.g. through the script managers mouse methods
+
+    Overlays and debug messages drawn from a tick are queued onto the GUI thread, and detections should be published through
+    ScriptManager.publishDetections(), so the GUI thread is the only thread that renders
+    """
+
+    # Signal emitted after every tick with the tick number and its duration in seconds
+    tickFinished = pyqtSignal(int, float)
+    # Signal emitted with an error message if a tick raises an exception, the runtime stops afterwards
+    tickFailed = pyqtSignal(str)
+
+
+    def __init__(self, script, perceive, decide, act = None, tickRate = 10, adaptive = True, maxTicks = None, historySize = 300, parent = None):
+        """
+        Initializes the BotRuntime() class
+
+         Parameters:
+        - script (ScriptManager): The script manager that every tick captures and acts through
+        - perceive (callable): Called with the script manager each tick, returns what was seen
+        - decide (callable): Called with the script manager and the result of perceive, returns the action to take
+        - act (optional callable): Called with the script manager and the result of decide (default = None, decide performs its own actions)
+        - tickRate (optional float): The number of ticks per second (default = 10)
+        - adaptive (optional bool): True if the tick rate should back off while the client frame is static, see ScriptManager.nextTickDelay() (default = True)
+        - maxTicks (optional int): The number of ticks to run before stopping (default = None, runs until stop() is called)
+        - historySize (optional int): The number of recent tick durations kept for the tick statistics (default = 300)
+        - parent (optional QObject): The parent of this thread (default = None)
+        """
+
+        super().__init__(parent)
+        self.script = script
+        self.perceive, self.decide, self.act = perceive, decide, act
+        self.tickRate = tickRate
+        self.adaptive = adaptive
+        self.maxTicks = maxTicks
+        # Counts the ticks run, the ticks that took longer than their interval and the tick slots that were skipped because of them
+        self.ticks = self.overruns = self.missedTicks = 0
+        # Stores the duration of the most recent ticks in seconds
+        self.tickTimes = deque(maxlen = historySize)
+        # Stores the error message that stopped the runtime (if any)
+        self.error = None
+        self.running = False
+        # Wakes the runtime from its wait between ticks the moment it is stopped
+        self._stopEvent = threading.Event()
+
+
+    def start(self, *args):
+        """
+        Starts running ticks on the worker thread, the runtime is marked as running here so that a stop() that arrives before
+        the worker thread starts is not undone by it
+        """
+
+        self.running = True
+        self._stopEvent.clear()
+        super().start(*args)
+
+
+    def run(self):
+        """
+        Runs ticks until stop() is called or maxTicks have run, this is called on the worker thread by QThread.start()
+        """
+
+        # Stores the time that the next tick is due
+        deadline = time.perf_counter()
+
+        while self.running and (self.maxTicks is None or self.ticks < self.maxTicks):
+
+            startTime = time.perf_counter()
+
+            try:
+
+                # Captures this ticks frame, then perceives, decides and acts on it
+                self.script.beginTick()
+                decision = self.decide(self.script, self.perceive(self.script))
+                if self.act is not None:
+                    self.act(self.script, decision)
+                self.script.endTick()
+
+            # Stops the runtime gracefully if a tick fails
+            except Exception as e:
+                self.error = f'Error running tick {self.ticks}: {e}'
+                self.tickFailed.emit(self.error)
+                break
+
+            # Records how long this tick took
+            duration = time.perf_counter() - startTime
+            self.ticks += 1
+            self.tickTimes.append(duration)
+            self.tickFinished.emit(self.ticks, duration)
+
+            # Uses the fixed tick interval, or one that backs off while the client frame is static
+            interval = 1 / self.tickRate
+            if self.adaptive:
+                interval = self.script.nextTickDelay(interval)
+
+            # Schedules the next tick one interval after this one was due, or straight away if this tick overran its interval
+            deadline += interval
+            now = time.perf_counter()
+            if now > deadline:
+                self.overruns += 1
+                self.missedTicks += int((now - deadline) / interval)
+                deadline = now
+
+            # Waits until the next tick is due, waking early if the runtime is stopped
+            self._stopEvent.wait(max(0.0, deadline - now))
+
+        self.running = False
+
+
+    def stop(self, timeout = 2000):
+        """
+        Stops the runtime after its current tick and waits for the worker thread to finish
+
+         Parameters:
+        - timeout (optional int): The longest time in milliseconds to wait for the current tick to finish (default = 2000)
+
+         Returns:
+        - True if the worker thread finished, else returns false
+        """
+
+        self.running = False
+        self._stopEvent.set()
+        return self.wait(timeout)
+
+
+    def stats(self):
+        """
+        Returns a dictionary of the number of ticks run, overruns, missed ticks and the tick durations in milliseconds
+        """
+
+        tickTimes = 1000 * np.array(self.tickTimes) if self.tickTimes else np.zeros(1)
+
+        return {
+            'ticks': self.ticks,
+            'tickRate': self.tickRate,
+            'overruns': self.overruns,
+            'missedTicks': self.missedTicks,
+            'meanMs': float(tickTimes.mean()),
+            'p95Ms': float(np.percentile(tickTimes, 95)),
+            'maxMs': float(tickTimes.max()),
+        }
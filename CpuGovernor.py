@@ -0,0 +1,133 @@
+# Imports the time library to measure the CPU and wall time of each tick
+import time
+from collections import deque
+
+
+class CpuGovernor():
+    """
+    Class that measures the CPU time a session spends on each tick and steps its workload down whenever it goes over its
+    CPU budget, so that several bots on one host do not degrade each others loop latency. The levels are:
+
+    - 0: Normal, every check runs at full rate
+    - 1: Throttled, a new frame is only captured every other tick
+    - 2: Reduced, template searches run on a half resolution pyramid level
+    - 3: Deferred, low priority checks are skipped
+    """
+
+    # Defines the highest workload reduction level
+    maxLevel = 3
+
+
+    def __init__(self, budget = None, window = 30, cooldown = 10):
+        """
+        Initializes the CpuGovernor() class
+
+         Parameters:
+        - budget (optional float): The fraction of one CPU core this session may use, e.g. 0.25 for a quarter of a core (default = None, measure only)
+        - window (optional int): The number of ticks that utilization is averaged over (default = 30)
+        - cooldown (optional int): The minimum number of ticks between level changes to prevent the level from flapping (default = 10)
+        """
+
+        self.budget = budget
+        self.cooldown = cooldown
+        # Stores the CPU and wall time of the most recent ticks
+        self.cpuTimes = deque(maxlen = window)
+        self.wallTimes = deque(maxlen = window)
+        # Stores the current workload reduction level
+        self.level = 0
+        # Counts every tick and the ticks since the level last changed
+        self.ticks = 0
+        self._sinceChange = 0
+        # Stores the CPU and wall time at the start of the current tick
+        self._tickStart = None
+
+
+    def beginTick(self):
+        """
+        Marks the start of a tick, this must be called from the thread that runs the session
+        """
+
+        self._tickStart = (time.thread_time(), time.perf_counter())
+
+
+    def endTick(self):
+        """
+        Marks the end of a tick, recording its CPU time and adjusting the level if the session is over or well under its budget
+        """
+
+        # Returns early if beginTick() was not called
+        if self._tickStart is None:
+            return
+
+        # Records how long the tick took in CPU time (for this thread only) and in wall time
+        cpuStart, wallStart = self._tickStart
+        self.cpuTimes.append(time.thread_time() - cpuStart)
+        self.wallTimes.append(time.perf_counter() - wallStart)
+        self._tickStart = None
+        self.ticks += 1
+        self._sinceChange += 1
+
+        # Returns early if no budget is being enforced or the level changed too recently
+        if self.budget is None or self._sinceChange < self.cooldown:
+            return
+
+        utilization = self.cpuUtilization()
+
+        # Steps the workload down if the session is over budget, or back up if it is comfortably under it
+        if utilization > self.budget and self.level < self.maxLevel:
+            self.level += 1
+            self._sinceChange = 0
+        elif utilization < self.budget * 0.6 and self.level > 0:
+            self.level -= 1
+            self._sinceChange = 0
+
+
+    def cpuUtilization(self):
+        """
+        Returns the fraction of one CPU core that this session has used over the recent ticks
+        """
+
+        wallTime = sum(self.wallTimes)
+        return sum(self.cpuTimes) / wallTime if wallTime > 0 else 0.0
+
+
+    def shouldCapture(self):
+        """
+        Returns true if a new frame should be captured this tick
+        """
+
+        return self.level < 1 or self.ticks % 2 == 0
+
+
+    def searchMode(self):
+        """
+        Returns the template search mode that should be used at the current level, either 'full' or 'pyramid'
+        """
+
+        return 'pyramid' if self.level >= 2 else 'full'
+
+
+    def shouldRun(self, priority = 'normal'):
+        """
+        Returns true if a check of the passed priority should run this tick
+
+         Parameters:
+        - priority (optional str): Either 'high', 'normal' or 'low' (default = 'normal')
+        """
+
+        return priority != 'low' or self.level < 3
+
+
+    def stats(self):
+        """
+        Returns a dictionary of this sessions current CPU utilization, budget, level and average tick times in milliseconds
+        """
+
+        return {
+            'utilization': self.cpuUtilization(),
+            'budget': self.budget,
+            'level': self.level,
+            'ticks': self.ticks,
+            'cpuMs': 1000 * sum(self.cpuTimes) / len(self.cpuTimes) if self.cpuTimes else 0.0,
+            'wallMs': 1000 * sum(self.wallTimes) / len(self.wallTimes) if self.wallTimes else 0.0,
+        }
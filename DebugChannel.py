@@ -0,0 +1,110 @@
+class DebugChannel():
+    """
+    Class that holds the debug messages waiting to be displayed by the OverlayManager. The channel is bounded, repeated messages
+    are merged into the one already waiting, messages posted under a key replace the previous message of that key, and the
+    message with the highest priority is always the one displayed
+    """
+
+
+    def __init__(self, maxSize = 32):
+        """
+        Initializes the DebugChannel() class
+
+         Parameters:
+        - maxSize (optional int): The maximum number of messages waiting in the channel, the lowest priority and oldest message is dropped once it is full (default = 32)
+        """
+
+        self.maxSize = maxSize
+        # Maps each entry ID to a list of its message, priority, sequence number and key
+        self.entries = {}
+        # Maps each waiting keyless message to its entry ID so repeated messages can be merged
+        self.messages = {}
+        # Maps each key to the entry ID of its latest message
+        self.slots = {}
+        # Counts every posted message, this is used for entry IDs and to keep messages of equal priority in order
+        self.sequence = 0
+        # Counts the messages that were merged or dropped
+        self.merged = self.dropped = 0
+
+
+    def post(self, debugMsg, priority = 0, key = None):
+        """
+        Posts a debug message to the channel
+
+         Parameters:
+        - debugMsg (str): The debug message to display
+        - priority (optional int): Messages with a higher priority are displayed first (default = 0)
+        - key (optional hashable): If passed, this message replaces the previous message posted under the same key (default = None)
+
+         Returns:
+        - The entry ID of the message, a repeated message returns the ID of the message it was merged into
+        """
+
+        # Replaces the message of an existing key in place so it keeps its position in the queue
+        if key is not None and key in self.slots:
+            entryId = self.slots[key]
+            self.entries[entryId][0] = debugMsg
+            self.entries[entryId][1] = max(self.entries[entryId][1], priority)
+            self.merged += 1
+            return entryId
+
+        # Merges a repeated keyless message into the one already waiting
+        if key is None and debugMsg in self.messages:
+            entryId = self.messages[debugMsg]
+            self.entries[entryId][1] = max(self.entries[entryId][1], priority)
+            self.merged += 1
+            return entryId
+
+        # Drops the lowest priority, oldest message if the channel is full
+        if len(self.entries) >= self.maxSize:
+            self.remove(min(self.entries, key = lambda entryId: (self.entries[entryId][1], self.entries[entryId][2])))
+            self.dropped += 1
+
+        # Adds the message as a new entry
+        self.sequence += 1
+        entryId = self.sequence
+        self.entries[entryId] = [debugMsg, priority, self.sequence, key]
+
+        if key is not None:
+            self.slots[key] = entryId
+        else:
+            self.messages[debugMsg] = entryId
+
+        return entryId
+
+
+    def remove(self, entryId):
+        """
+        Removes the message with the passed entry ID from the channel (if it is still waiting)
+        """
+
+        entry = self.entries.pop(entryId, None)
+
+        # Removes the message from its key slot or from the repeated message map
+        if entry is not None:
+            if entry[3] is not None:
+                self.slots.pop(entry[3], None)
+            else:
+                self.messages.pop(entry[0], None)
+
+
+    def current(self):
+        """
+        Returns a tuple of the entry ID and message that should currently be displayed, or (None, None) if the channel is empty
+        """
+
+        # Returns early if there are no messages
+        if not self.entries:
+            return None, None
+
+        # Displays the highest priority message, or the oldest of several messages with the same priority
+        entryId = min(self.entries, key = lambda entryId: (-self.entries[entryId][1], self.entries[entryId][2]))
+        return entryId, self.entries[entryId][0]
+
+
+    def __len__(self):
+        """
+        Returns the number of messages waiting in the channel
+        """
+
+        return len(self.entries)
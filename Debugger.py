@@ -1,35 +1,144 @@
 # Imports sys library for immediate exit after handling a runtime error
 import sys
+# Imports the libraries used to time hot paths and summarize their timings at exit
+import time
+import atexit
+import functools
+# Imports the libraries used to hand log records to the background writer thread
+import queue
+import threading
+from collections import deque
+
+
+class _Span():
+    """
+    Context manager that records the time spent inside it under the passed name, see Debugger.span()
+    """
+
+    __slots__ = ('name', 'startTime')
+
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __enter__(self):
+        self.startTime = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc):
+        Debugger.record(self.name, time.perf_counter() - self.startTime)
+
+
+class _NullSpan():
+    """
+    Context manager that does nothing, this is returned by Debugger.span() while timing is disabled
+    """
+
+    __slots__ = ()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        pass
 
 
 class Debugger():
     """
-    Handles all debug messages drawn to the screen or console or log errors for all classes
+    Handles all debug messages drawn to the screen or console or log errors for all classes, along with timing the hot
+    paths of every class (capturing, matching, mouse moves and overlay paints) while timing is enabled.
+
+    Messages are logged at a level and are only formatted and written by a background writer thread, so logging never
+    blocks a busy loop on console or file I/O. A message below the current level costs a single comparison
     """
 
+    # Defines the log levels, messages below the current level are dropped before they are formatted
+    DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+    levelNames = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+    # Defines the console color of each level
+    levelColors = {DEBUG: '\033[93m', INFO: '', WARNING: '\033[33m', ERROR: '\033[91m'}
+    # The lowest level that is logged
+    level = DEBUG
+    # Stores every sink as a list of [level, file (None for the console), colored]
+    sinks = [[DEBUG, None, True]]
+    # The queue of records waiting to be written, and the writer thread that writes them
+    _records = queue.SimpleQueue()
+    _writer = None
+    _writerLock = threading.Lock()
+
+    # True while hot path timings are being recorded, this is the only thing checked on a hot path while timing is disabled
+    timingEnabled = False
+    # The number of recent timings kept for each span
+    timingBufferSize = 1024
+    # Maps each span name to a ring buffer of its most recent timings in seconds, and to the number of times it has been recorded
+    timings = {}
+    timingCounts = {}
+    # The shared span returned while timing is disabled
+    _nullSpan = _NullSpan()
+    # True once the timing summary has been registered to print at exit
+    _dumpRegistered = False
+
     @staticmethod
-    def debug(debugMsg):
+    def log(level, msg, *args):
+        """
+        Queues a message to be written by the background writer thread, the message is only formatted by the writer thread
+
+         Parameters:
+        - level (int): The level of the message, e.g. Debugger.INFO
+        - msg (str or callable): The message, formatted with str.format(*args) if any args are passed, or a function that returns the message
+        - args: The values to format the message with
         """
-        Paints debug info to the screen to inform the user of the action currently being undertaken by the bot
+
+        # Drops the message before doing any work if its level is disabled
+        if level < Debugger.level:
+            return
+
+        # Starts the writer thread the first time a message is logged
+        if Debugger._writer is None:
+            Debugger.__startWriter()
+
+        Debugger._records.put((level, msg, args))
+
+
+    @staticmethod
+    def debug(debugMsg, *args):
+        """
+        Logs debug info to the console to inform the user of the action currently being undertaken by the bot
         
          Parameters:
-        - debugMsg (str): The debug message to be displayed at the top of the game client to inform the user of the current process being performed
+        - debugMsg (str or callable): The debug message, formatted with str.format(*args) on the writer thread if any args are passed
         """
         
-        try:
-            
-            # Writes debug message to the console with a yellow font color
-            print(f'\033[93m{debugMsg}\033[0m')
-            
-        # Catches any errors gracefully
-        except Exception as e:
-            
-            # Prints an informative error message to the console
-            Debugger.logError(f'Error printing debug message: {e}')
+        if Debugger.DEBUG >= Debugger.level:
+            Debugger.log(Debugger.DEBUG, debugMsg, *args)
+
+
+    @staticmethod
+    def info(infoMsg, *args):
+        """
+        Logs an informative message, see Debugger.log() for more information
+        """
+
+        if Debugger.INFO >= Debugger.level:
+            Debugger.log(Debugger.INFO, infoMsg, *args)
+
+
+    @staticmethod
+    def warning(warningMsg, *args):
+        """
+        Logs a warning message, see Debugger.log() for more information
+        """
+
+        if Debugger.WARNING >= Debugger.level:
+            Debugger.log(Debugger.WARNING, warningMsg, *args)
             
 
     @staticmethod
-    def logError(errorMsg):
+    def logError(errorMsg, *args):
         """
         Method that writes an error to the console then quits the application to ensure it exits after an exception is handled
         
@@ -37,7 +146,242 @@ class Debugger():
         - errorMsg (str): The error message to print to the console before exiting
         """
         
-        # Prints the passed error message to the console with a red font color
-        print(f'\033[91m{errorMsg}\033[0m')
+        # Logs the passed error message and waits for it, and every message before it, to be written before exiting
+        Debugger.log(Debugger.ERROR, errorMsg, *args)
+        Debugger.flush()
         # System exits with a non-zero exit code to show that an error or exception has occured
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+
+    @staticmethod
+    def setLevel(level):
+        """
+        Sets the lowest level that is logged, e.g. Debugger.setLevel(Debugger.WARNING) drops every debug and info message
+        """
+
+        Debugger.level = level
+
+
+    @staticmethod
+    def addFileSink(path, level = DEBUG):
+        """
+        Writes every message at or above the passed level to the passed file as well as the console
+
+         Parameters:
+        - path (str): The path of the log file, messages are appended to it
+        - level (optional int): The lowest level written to the file (default = Debugger.DEBUG)
+        """
+
+        Debugger.sinks.append([level, open(path, 'a', encoding = 'utf-8'), False])
+
+
+    @staticmethod
+    def flush(timeout = 2.0):
+        """
+        Waits until every message logged so far has been written
+
+         Parameters:
+        - timeout (optional float): The longest time in seconds to wait (default = 2.0)
+        """
+
+        # Returns early if nothing has ever been logged
+        if Debugger._writer is None:
+            return
+
+        # Queues a marker behind every logged message and waits for the writer to reach it
+        written = threading.Event()
+        Debugger._records.put(written)
+        written.wait(timeout)
+
+
+    @staticmethod
+    def __startWriter():
+        """
+        Starts the background writer thread and registers it to be flushed at exit.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        with Debugger._writerLock:
+
+            # Returns early if another thread started the writer first
+            if Debugger._writer is not None:
+                return
+
+            Debugger._writer = threading.Thread(target = Debugger.__write, name = 'DebuggerWriter', daemon = True)
+            Debugger._writer.start()
+            atexit.register(Debugger.flush)
+
+
+    @staticmethod
+    def __write():
+        """
+        Writer thread loop that formats each queued message and writes it to every sink whose level it reaches.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        while True:
+
+            record = Debugger._records.get()
+
+            # Sets flush markers once every message before them has been written
+            if isinstance(record, threading.Event):
+                for sinkLevel, sink, colored in Debugger.sinks:
+                    (sink or sys.stdout).flush()
+                record.set()
+                continue
+
+            level, msg, args = record
+
+            # Formats the message now that it is off the callers thread
+            try:
+                text = msg() if callable(msg) else (str(msg).format(*args) if args else str(msg))
+            except Exception as e:
+                text = f'{msg!r} {args!r} (failed to format: {e})'
+
+            # Writes the message to every sink whose level it reaches, coloring it on the console
+            for sinkLevel, sink, colored in Debugger.sinks:
+
+                if level < sinkLevel:
+                    continue
+
+                try:
+                    if sink is None:
+                        color = Debugger.levelColors[level] if colored else ''
+                        sys.stdout.write(f'{color}{text}\033[0m\n' if color else f'{text}\n')
+                    else:
+                        sink.write(f'{time.strftime("%Y-%m-%d %H:%M:%S")} {Debugger.levelNames.get(level, level)} {text}\n')
+                except Exception:
+                    pass
+
+
+    @staticmethod
+    def enableTiming(enabled = True, bufferSize = 1024, dumpAtExit = True):
+        """
+        Enables or disables recording how long each hot path takes
+
+         Parameters:
+        - enabled (optional bool): True to record timings, False to stop recording them (default = True)
+        - bufferSize (optional int): The number of recent timings kept for each span, spans already recorded are resized too (default = 1024)
+        - dumpAtExit (optional bool): True to print a summary of every span when the application exits (default = True)
+        """
+
+        Debugger.timingEnabled = enabled
+
+        # Resizes the ring buffers of the spans already recorded, keeping their most recent timings
+        if bufferSize != Debugger.timingBufferSize:
+            Debugger.timings = {name: deque(buffer, maxlen = bufferSize) for name, buffer in list(Debugger.timings.items())}
+            Debugger.timingBufferSize = bufferSize
+
+        # Registers the summary to print at exit only once
+        if enabled and dumpAtExit and not Debugger._dumpRegistered:
+            atexit.register(Debugger.dumpTimings)
+            Debugger._dumpRegistered = True
+
+
+    @staticmethod
+    def span(name):
+        """
+        Returns a context manager that records the time spent inside it, e.g. 'with Debugger.span("search.match"):'
+
+         Parameters:
+        - name (str): The name to record the timing under, e.g. 'search.capture'
+        """
+
+        return _Span(name) if Debugger.timingEnabled else Debugger._nullSpan
+
+
+    @staticmethod
+    def timed(name):
+        """
+        Decorator that records how long each call of the decorated function takes, costing a single flag check while timing is disabled
+
+         Parameters:
+        - name (str): The name to record the timing under, e.g. 'mouse.moveTo'
+        """
+
+        def decorator(function):
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+
+                # Calls the function directly while timing is disabled
+                if not Debugger.timingEnabled:
+                    return function(*args, **kwargs)
+
+                startTime = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    Debugger.record(name, time.perf_counter() - startTime)
+
+            return wrapper
+
+        return decorator
+
+
+    @staticmethod
+    def record(name, seconds):
+        """
+        Records a single timing of the passed span, only the most recent timings of each span are kept
+
+         Parameters:
+        - name (str): The name of the span
+        - seconds (float): The time the span took in seconds
+        """
+
+        # Creates a fixed size ring buffer for the span the first time it is recorded
+        buffer = Debugger.timings.get(name)
+        if buffer is None:
+            buffer = Debugger.timings.setdefault(name, deque(maxlen = Debugger.timingBufferSize))
+
+        buffer.append(seconds)
+        Debugger.timingCounts[name] = Debugger.timingCounts.get(name, 0) + 1
+
+
+    @staticmethod
+    def timingSummary():
+        """
+        Returns a dictionary mapping each span name to its call count and the mean, 50th, 95th, 99th percentile and maximum
+        of its recent timings in milliseconds
+        """
+
+        summary = {}
+
+        for name, buffer in list(Debugger.timings.items()):
+
+            # Sorts a snapshot of the recent timings once to read every percentile from it
+            samples = sorted(buffer)
+            if not samples:
+                continue
+            percentile = lambda fraction: 1000 * samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+            summary[name] = {
+                'count': Debugger.timingCounts.get(name, len(samples)),
+                'meanMs': 1000 * sum(samples) / len(samples),
+                'p50Ms': percentile(0.5),
+                'p95Ms': percentile(0.95),
+                'p99Ms': percentile(0.99),
+                'maxMs': 1000 * samples[-1],
+            }
+
+        return summary
+
+
+    @staticmethod
+    def dumpTimings(file = None):
+        """
+        Prints a table of every span's timing summary
+
+         Parameters:
+        - file (optional file): The file to write the table to (default = None, writes to the console)
+        """
+
+        summary = Debugger.timingSummary()
+
+        # Returns early if nothing has been timed
+        if not summary:
+            return
+
+        print(f"{'span':<32}{'count':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)", file = file)
+        for name, stats in sorted(summary.items()):
+            print(f"{name:<32}{stats['count']:>10}{stats['meanMs']:>10.3f}{stats['p50Ms']:>10.3f}{stats['p95Ms']:>10.3f}{stats['p99Ms']:>10.3f}{stats['maxMs']:>10.3f}", file = file)
@@ -0,0 +1,83 @@
+# Imports the threading library to guard the latest batches shared between the producer threads and the GUI thread
+import threading
+from collections import namedtuple
+# Imports the QObject class and signals which queue each published batch onto the GUI thread
+from PyQt5.QtCore import QObject, pyqtSignal
+import numpy as np
+
+
+# A batch of detections published to a single channel, boxes are (x, y, width, height) rows and blobs are (x, y) rows in client coordinates
+Detections = namedtuple('Detections', ['channel', 'boxes', 'scores', 'blobs', 'color'])
+
+
+class DetectionBridge(QObject):
+    """
+    Class that carries batches of detections from any search or worker thread onto the GUI thread. Only the latest batch of
+    each channel is kept, so a producer publishing faster than the overlay repaints never blocks and never builds a backlog
+    """
+
+    # Signal that tells the GUI thread a new batch is waiting on the passed channel
+    batchReady = pyqtSignal(str)
+
+
+    def __init__(self, parent = None):
+        """
+        Initializes the DetectionBridge() class, this must be created on the GUI thread
+
+         Parameters:
+        - parent (optional QObject): The parent of this bridge, its batchReady slots run on the parents thread (default = None)
+        """
+
+        super().__init__(parent)
+        # Stores the latest batch published to each channel
+        self.latest = {}
+        # Stores the channels that have a signal queued which the GUI thread has not handled yet
+        self.pending = set()
+        # Counts the batches published and the batches replaced before the GUI thread took them
+        self.published = self.replaced = 0
+        self._lock = threading.Lock()
+
+
+    def publish(self, channel, boxes = None, scores = None, blobs = None, color = None):
+        """
+        Publishes a batch of detections to the passed channel, replacing any batch on that channel that has not been drawn yet.
+        This is safe to call from any thread and never waits on the GUI thread
+
+         Parameters:
+        - channel (str): The name of the channel, e.g. the template or detector that produced the batch
+        - boxes (optional array-like): An (n, 4) array of (x, y, width, height) boxes in client coordinates (default = None)
+        - scores (optional array-like): The n match scores of the boxes, drawn next to each box (default = None)
+        - blobs (optional array-like): An (m, 2) array of (x, y) blob centres in client coordinates (default = None)
+        - color (optional str): The color to draw this channel in (default = None, uses the overlay color)
+        """
+
+        # Converts the batch to arrays on the producers thread so that the GUI thread only has to draw it
+        batch = Detections(channel,
+                           np.asarray(boxes if boxes is not None else (), np.int32).reshape(-1, 4),
+                           None if scores is None else np.asarray(scores, np.float32).ravel(),
+                           np.asarray(blobs if blobs is not None else (), np.int32).reshape(-1, 2),
+                           color)
+
+        with self._lock:
+
+            self.published += 1
+            self.replaced += channel in self.latest
+            self.latest[channel] = batch
+
+            # Returns early if the GUI thread has already been told about this channel, it will take this batch instead
+            if channel in self.pending:
+                return
+            self.pending.add(channel)
+
+        # Queues a single signal per channel onto the GUI thread
+        self.batchReady.emit(channel)
+
+
+    def take(self, channel):
+        """
+        Returns and removes the latest batch published to the passed channel, or None if there is none, this is called on the GUI thread
+        """
+
+        with self._lock:
+            self.pending.discard(channel)
+            return self.latest.pop(channel, None)
@@ -0,0 +1,217 @@
+# Imports os library to list the images of a recorded frame directory
+import os
+import time
+import threading
+import cv2
+import numpy as np
+
+
+class ScreenFrameSource():
+    """
+    Frame source that captures live frames of the screen, this is the default frame source used by the SearchManager
+    """
+
+
+    def __init__(self, region = None):
+        """
+        Initializes the ScreenFrameSource() class
+
+         Parameters:
+        - region (optional tuple of ints): The (left, top, width, height) area of the screen to capture (default = None, captures the whole screen)
+        """
+
+        self.region = region
+
+
+    def setRegion(self, region):
+        """
+        Sets the (left, top, width, height) area of the screen to capture, None captures the whole screen
+        """
+
+        self.region = region
+
+
+    def __call__(self):
+        """
+        Returns a new RGB frame of the capture region as a numpy array
+        """
+
+        # Imports pyautogui only when a live frame is first captured since importing it probes the display
+        import pyautogui
+        return np.array(pyautogui.screenshot(region = self.region))
+
+
+class RecordedFrameSource():
+    """
+    Frame source that replays previously recorded frames instead of capturing the screen, this allows the whole
+    script pipeline to run headless at full speed
+    """
+
+
+    def __init__(self, frames, loop = True):
+        """
+        Initializes the RecordedFrameSource() class
+
+         Parameters:
+        - frames (str or list of numpy arrays): A directory of recorded frame images, or a list of RGB frames to replay
+        - loop (optional bool): True if the frames should restart from the beginning once they have all been replayed (default = True)
+        """
+
+        # Loads every image in the passed directory in filename order, converting each one to RGB to match a live capture
+        if isinstance(frames, str):
+            frames = [cv2.cvtColor(cv2.imread(os.path.join(frames, filename)), cv2.COLOR_BGR2RGB)
+                      for filename in sorted(os.listdir(frames)) if filename.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
+        self.frames = frames
+        self.loop = loop
+        # Stores the index of the next frame to replay
+        self.index = 0
+
+
+    def __call__(self):
+        """
+        Returns the next recorded RGB frame, or None once every frame has been replayed and looping is disabled
+        """
+
+        # Restarts from the first frame or returns None once every frame has been replayed
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                return None
+            self.index = 0
+
+        frame = self.frames[self.index]
+        self.index += 1
+        return frame
+
+
+class SharedScreenCapture():
+    """
+    Captures the screen once for every session sharing this host, each session reads its own client region from the 
+    shared capture through a SharedRegionSource() instead of taking a full screenshot of its own
+    """
+
+
+    def __init__(self, maxAge = 0.02):
+        """
+        Initializes the SharedScreenCapture() class
+
+         Parameters:
+        - maxAge (optional float): The time in seconds that a capture is shared for before a new one is taken (default = 0.02)
+        """
+
+        self.maxAge = maxAge
+        # Stores the region of every session reading from this capture
+        self.regions = {}
+        # Stores the latest capture, the (left, top) screen position of its top-left corner and the time it was taken
+        self.frame, self.origin, self.capturedAt = None, (0, 0), 0.0
+        # True if the latest capture covers the whole screen
+        self.fullScreen = False
+        self._lock = threading.Lock()
+
+
+    def view(self, region = None):
+        """
+        Returns a frame source that reads the passed region from this shared capture
+
+         Parameters:
+        - region (optional tuple of ints): The (left, top, width, height) area of the screen that the session reads (default = None, the whole screen)
+        """
+
+        return SharedRegionSource(self, region)
+
+
+    def grab(self, source):
+        """
+        Returns the region of the passed source, taking a new capture that covers every registered region only if the latest one has expired
+        """
+
+        with self._lock:
+
+            region = self.regions.get(source)
+
+            # Takes a new capture if the latest one has expired or does not cover the requested region
+            if self.frame is None or time.perf_counter() - self.capturedAt > self.maxAge or not self._covers(region):
+                self._capture()
+
+            # Returns the whole capture if no region was requested
+            if region is None:
+                return self.frame
+
+            # Crops the requested region from the shared capture
+            left, top, width, height = region
+            x, y = left - self.origin[0], top - self.origin[1]
+            return self.frame[y:y + height, x:x + width]
+
+
+    def _covers(self, region):
+        """
+        Returns true if the latest capture covers the passed region
+        """
+
+        if region is None:
+            return self.fullScreen
+
+        left, top, width, height = region
+        return (left >= self.origin[0] and top >= self.origin[1] and left + width <= self.origin[0] + self.frame.shape[1]
+                and top + height <= self.origin[1] + self.frame.shape[0])
+
+
+    def _capture(self):
+        """
+        Takes a single capture of the bounding box of every registered region
+        """
+
+        # Imports pyautogui only when a live frame is first captured since importing it probes the display
+        import pyautogui
+
+        regions = list(self.regions.values())
+
+        # Captures the whole screen if any session reads the whole screen, else only the union of the session regions
+        if not regions or None in regions:
+            bounds = None
+            self.origin = (0, 0)
+        else:
+            left, top = min(region[0] for region in regions), min(region[1] for region in regions)
+            right, bottom = max(region[0] + region[2] for region in regions), max(region[1] + region[3] for region in regions)
+            bounds = (left, top, right - left, bottom - top)
+            self.origin = (left, top)
+
+        self.fullScreen = bounds is None
+        self.frame = np.array(pyautogui.screenshot(region = bounds))
+        self.capturedAt = time.perf_counter()
+
+
+class SharedRegionSource():
+    """
+    Frame source that reads one sessions region from a SharedScreenCapture()
+    """
+
+
+    def __init__(self, capture, region = None):
+        """
+        Initializes the SharedRegionSource() class
+
+         Parameters:
+        - capture (SharedScreenCapture): The shared capture to read from
+        - region (optional tuple of ints): The (left, top, width, height) area of the screen to read (default = None, the whole screen)
+        """
+
+        self.capture = capture
+        self.setRegion(region)
+
+
+    def setRegion(self, region):
+        """
+        Sets the (left, top, width, height) area of the screen to read, None reads the whole screen
+        """
+
+        with self.capture._lock:
+            self.capture.regions[self] = region
+
+
+    def __call__(self):
+        """
+        Returns the latest RGB frame of this sources region
+        """
+
+        return self.capture.grab(self)
@@ -0,0 +1,385 @@
+# Imports the time library to timestamp input events and measure their latency
+import time
+# Imports the sys library to check which operating system the raw input backend is running on
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import deque, namedtuple
+
+
+# Defines the position tuple returned by every backend so callers can use either position.x or unpack it
+Position = namedtuple('Position', ['x', 'y'])
+
+
+class InputBackend(ABC):
+    """
+    Base class for every input backend that the MouseManager sends its mouse events through. Each public method times the
+    event it performs so that input latency can be compared between backends. A backend that does not implement every
+    abstract method can not be created
+    """
+
+    # True if events performed through this backend take real time, headless backends set this to false so nothing waits on them
+    realtime = True
+
+
+    def __init__(self, historySize = 1024):
+        """
+        Initializes the InputBackend() class
+
+         Parameters:
+        - historySize (optional int): The number of latency samples kept for each type of event (default = 1024)
+        """
+
+        self.historySize = historySize
+        # Maps each event type to a bounded list of its most recent latencies in seconds
+        self.latencies = {}
+
+
+    def position(self):
+        """
+        Returns the cursors current position
+        """
+
+        return Position(*self._position())
+
+
+    def moveTo(self, x, y):
+        """
+        Instantly moves the cursor to the passed position
+        """
+
+        self._timed('move', self._moveTo, x, y)
+
+
+    def click(self, x = None, y = None, button = 'left', clicks = 1, interval = 0.0):
+        """
+        Clicks the passed button a number of times at the passed or current position
+        """
+
+        self._timed('click', self._click, x, y, button, clicks, interval)
+
+
+    def mouseDown(self, x = None, y = None, button = 'left'):
+        """
+        Presses the passed button down at the passed or current position
+        """
+
+        self._timed('mouseDown', self._mouseDown, x, y, button)
+
+
+    def mouseUp(self, x = None, y = None, button = 'left'):
+        """
+        Releases the passed button at the passed or current position
+        """
+
+        self._timed('mouseUp', self._mouseUp, x, y, button)
+
+
+    def scroll(self, amount, x = None, y = None):
+        """
+        Scrolls by the passed amount of clicks, positive amounts scroll up and negative amounts scroll down
+        """
+
+        self._timed('scroll', self._scroll, amount, x, y)
+
+
+    def latencyStats(self):
+        """
+        Returns a dictionary of input latency metrics for each type of event
+
+         Returns:
+        - A dictionary mapping each event type to its count, mean, p50, p95 and max latency in milliseconds
+        """
+
+        stats = {}
+
+        for kind, samples in self.latencies.items():
+
+            # Sorts a copy of the samples so the percentiles can be read straight from it
+            ordered = sorted(samples)
+            stats[kind] = {
+                'count': len(ordered),
+                'mean': 1000 * sum(ordered) / len(ordered),
+                'p50': 1000 * ordered[len(ordered) // 2],
+                'p95': 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'max': 1000 * ordered[-1],
+            }
+
+        return stats
+
+
+    def _timed(self, kind, function, *args):
+        """
+        Performs the passed event function and records how long it took
+        """
+
+        start = time.perf_counter()
+        function(*args)
+        self.latencies.setdefault(kind, deque(maxlen = self.historySize)).append(time.perf_counter() - start)
+
+
+    # Methods that each backend must implement
+
+    @abstractmethod
+    def _position(self):
+        """
+        Returns the cursors current position as an (x, y) tuple
+        """
+
+    @abstractmethod
+    def _moveTo(self, x, y):
+        """
+        Instantly moves the cursor to the passed position
+        """
+
+    @abstractmethod
+    def _click(self, x, y, button, clicks, interval):
+        """
+        Clicks the passed button a number of times at the passed or current position
+        """
+
+    @abstractmethod
+    def _mouseDown(self, x, y, button):
+        """
+        Presses the passed button down at the passed or current position
+        """
+
+    @abstractmethod
+    def _mouseUp(self, x, y, button):
+        """
+        Releases the passed button at the passed or current position
+        """
+
+    @abstractmethod
+    def _scroll(self, amount, x, y):
+        """
+        Scrolls by the passed amount of clicks at the passed or current position
+        """
+
+
+class PyAutoGuiBackend(InputBackend):
+    """
+    Input backend that sends every event through pyautogui, this is the default backend
+    """
+
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the PyAutoGuiBackend() class, pyautogui is only imported here since importing it probes the display
+        """
+
+        super().__init__(*args, **kwargs)
+        import pyautogui
+        self.mouse = pyautogui
+
+
+    def _position(self):
+        return self.mouse.position()
+
+    def _moveTo(self, x, y):
+        self.mouse.moveTo(x, y, _pause = False)
+
+    def _click(self, x, y, button, clicks, interval):
+        self.mouse.click(x, y, clicks, interval, button, _pause = False)
+
+    def _mouseDown(self, x, y, button):
+        self.mouse.mouseDown(x, y, button, _pause = False)
+
+    def _mouseUp(self, x, y, button):
+        self.mouse.mouseUp(x, y, button, _pause = False)
+
+    def _scroll(self, amount, x, y):
+        self.mouse.scroll(amount, x, y, _pause = False)
+
+
+class RawInputBackend(InputBackend):
+    """
+    Input backend that sends events straight to the Windows user32 API, skipping pyautogui's argument handling and failsafe checks
+    """
+
+    # Defines the user32 mouse_event flags for each button as a tuple of its down and up flags
+    buttonFlags = {'left': (0x0002, 0x0004), 'right': (0x0008, 0x0010), 'middle': (0x0020, 0x0040)}
+    # Defines the user32 mouse_event flag for the scroll wheel and the amount that one wheel click scrolls by
+    wheelFlag, wheelDelta = 0x0800, 120
+
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the RawInputBackend() class, raising an error if this is not running on Windows
+        """
+
+        super().__init__(*args, **kwargs)
+
+        # Ensures the user32 API is available before proceeding
+        if not sys.platform.startswith('win'):
+            raise OSError('The raw input backend is only available on Windows!')
+
+        import ctypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+
+
+    def _position(self):
+        point = (self.ctypes.c_long * 2)()
+        self.user32.GetCursorPos(point)
+        return point[0], point[1]
+
+    def _moveTo(self, x, y):
+        self.user32.SetCursorPos(int(x), int(y))
+
+    def _moveIfPassed(self, x, y):
+        # Moves the cursor only if a position was passed
+        if x is not None and y is not None:
+            self._moveTo(x, y)
+
+    def _click(self, x, y, button, clicks, interval):
+        self._moveIfPassed(x, y)
+        down, up = self.buttonFlags[button]
+        for click in range(clicks):
+            self.user32.mouse_event(down, 0, 0, 0, 0)
+            self.user32.mouse_event(up, 0, 0, 0, 0)
+            if interval and click < clicks - 1:
+                time.sleep(interval)
+
+    def _mouseDown(self, x, y, button):
+        self._moveIfPassed(x, y)
+        self.user32.mouse_event(self.buttonFlags[button][0], 0, 0, 0, 0)
+
+    def _mouseUp(self, x, y, button):
+        self._moveIfPassed(x, y)
+        self.user32.mouse_event(self.buttonFlags[button][1], 0, 0, 0, 0)
+
+    def _scroll(self, amount, x, y):
+        self._moveIfPassed(x, y)
+        self.user32.mouse_event(self.wheelFlag, 0, 0, int(amount * self.wheelDelta), 0)
+
+
+class RecordingBackend(InputBackend):
+    """
+    Input backend that performs no real input and instead records every event in memory with a timestamp, this allows
+    every action path to be exercised and timed at full speed on a machine without a display
+    """
+
+    # Recorded events take no real time so nothing needs to wait for them
+    realtime = False
+
+
+    def __init__(self, startX = 0, startY = 0, *args, **kwargs):
+        """
+        Initializes the RecordingBackend() class
+
+         Parameters:
+        - startX, startY (optional ints): The position that the virtual cursor starts at (default = 0, 0)
+        """
+
+        super().__init__(*args, **kwargs)
+        # Tracks the position of the virtual cursor
+        self.x, self.y = startX, startY
+        # Stores every event as a tuple of its timestamp, type and arguments
+        self.events = []
+
+
+    def eventsOfKind(self, kind):
+        """
+        Returns every recorded event of the passed type
+        """
+
+        return [event for event in self.events if event[1] == kind]
+
+
+    def clear(self):
+        """
+        Removes every recorded event
+        """
+
+        self.events.clear()
+
+
+    def _record(self, kind, *args):
+        # Moves the virtual cursor if the event was given a position
+        if len(args) >= 2 and args[0] is not None and args[1] is not None:
+            self.x, self.y = args[0], args[1]
+        self.events.append((time.perf_counter(), kind, args))
+
+    def _position(self):
+        return self.x, self.y
+
+    def _moveTo(self, x, y):
+        self._record('move', x, y)
+
+    def _click(self, x, y, button, clicks, interval):
+        self._record('click', x, y, button, clicks)
+
+    def _mouseDown(self, x, y, button):
+        self._record('mouseDown', x, y, button)
+
+    def _mouseUp(self, x, y, button):
+        self._record('mouseUp', x, y, button)
+
+    def _scroll(self, amount, x, y):
+        self._record('scroll', x, y, amount)
+
+
+class FairLock():
+    """
+    Re-entrant lock that hands the shared mouse to waiting threads in the order they asked for it, so that when several
+    sessions share one mouse no session can starve the others by repeatedly re-acquiring it
+    """
+
+
+    def __init__(self):
+        """
+        Initializes the FairLock() class
+        """
+
+        self._condition = threading.Condition()
+        # Stores the threads waiting for the lock in the order they asked for it
+        self._waiting = deque()
+        # Stores the thread holding the lock and the number of times it has acquired it
+        self._owner = None
+        self._count = 0
+
+
+    def acquire(self):
+        """
+        Blocks until it is this threads turn to hold the lock
+        """
+
+        me = threading.get_ident()
+
+        with self._condition:
+
+            # Re-enters the lock if this thread already holds it
+            if self._owner == me:
+                self._count += 1
+                return True
+
+            # Joins the back of the queue and waits until this thread is at the front and the lock is free
+            self._waiting.append(me)
+            while self._owner is not None or self._waiting[0] != me:
+                self._condition.wait()
+
+            self._waiting.popleft()
+            self._owner, self._count = me, 1
+            return True
+
+
+    def release(self):
+        """
+        Releases one level of the lock, handing it to the next waiting thread once it is fully released
+        """
+
+        with self._condition:
+
+            self._count -= 1
+            if self._count == 0:
+                self._owner = None
+                self._condition.notify_all()
+
+
+    def __enter__(self):
+        return self.acquire()
+
+
+    def __exit__(self, *args):
+        self.release()
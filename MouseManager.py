@@ -1,4 +1,13 @@
-import pyautogui as mouse
+import time
+import numpy as np
+# Imports the input backends that every mouse event is sent through
+from InputBackend import PyAutoGuiBackend, FairLock
+# Imports the action queue which performs mouse actions on a worker thread without blocking the caller
+from ActionQueue import ActionQueue
+# Imports the trajectory engine which generates human-like mouse paths scaled to the distance travelled
+from Trajectory import TrajectoryEngine
+# Imports the debugger class to time this classes hot paths while timing is enabled
+from Debugger import Debugger
 
 class MouseManager():
     """
@@ -6,18 +15,113 @@ class MouseManager():
     """
 
 
-    def __init__(self, lunaClient):
+    def __init__(self, lunaClient, boundsTTL = 1.0, backend = None, inputLock = None):
         """
         Initializes the MouseManager() class
         
          Parameters:
         - lunaClient (Win32Window): The client that the script manager is applying the botting scripts to
+        - boundsTTL (optional float): The time in seconds before the cached client bounds are re-read from the window system (default = 1.0)
+        - backend (optional InputBackend): The backend that every mouse event is sent through (default = PyAutoGuiBackend())
+        - inputLock (optional FairLock): The lock held during each mouse action, pass the same lock to every session sharing one mouse (default = a new FairLock())
         """
         
         # Initializes boundary variables to check if coordinates are out of bounds or not
         self.client = lunaClient
+        # Stores the input backend that every mouse event is sent through
+        self.backend = backend if backend is not None else PyAutoGuiBackend()
+        # Stores the lock that is held during each mouse action so that sessions sharing this mouse take fair turns with it
+        self.inputLock = inputLock if inputLock is not None else FairLock()
+        # Caches the client bounds so that the window system is not queried on every click and validation
+        self.boundsTTL = boundsTTL
+        self._bounds = None
+        self._boundsTime = 0.0
+        # Stores whether the bounds are pushed by a geometry watcher, in which case they never expire and the window system is not queried
+        self.watched = False
+        # Creates the trajectory engine that every mouse movement is played through
+        self.trajectory = TrajectoryEngine(realtime = self.backend.realtime)
+        # Creates the action queue that performs non-blocking moves, clicks, drags and scrolls, each of which return a future
+        self.actions = ActionQueue(self)
     
     
+    def getBounds(self):
+        """
+        Returns the cached client bounds as a tuple of (xMin, yMin, xMax, yMax), re-reading them from the window system
+        only if they have been invalidated or, while no geometry watcher is pushing them, are older than the bounds TTL
+        """
+
+        # Re-reads the bounds if the cache is empty or has expired
+        if self._bounds is None or (not self.watched and time.monotonic() - self._boundsTime > self.boundsTTL):
+            self.__setBounds(self.client.left, self.client.top, self.client.width, self.client.height)
+
+        return self._bounds
+
+
+    def onGeometryChanged(self, left, top, width, height):
+        """
+        Updates the cached client bounds, this is called by a window geometry watcher whenever the client is moved or resized.
+        Once called, the bounds no longer expire since the watcher keeps them up to date
+
+         Parameters:
+        - left, top (ints): The position of the top-left corner of the client
+        - width, height (ints): The size of the client
+        """
+
+        self.watched = True
+        self.__setBounds(left, top, width, height)
+
+
+    def __setBounds(self, left, top, width, height):
+        """
+        Stores the passed client geometry as the cached bounds.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        self._bounds = (left, top, left + width, top + height)
+        self._boundsTime = time.monotonic()
+
+
+    def onWindowEvent(self, event):
+        """
+        Updates the cached client bounds from a GeometryEvent published by the window managers geometry watcher
+        """
+
+        # Only moves and resizes change the bounds
+        if event.kind in ('moved', 'resized'):
+            self.onGeometryChanged(event.left, event.top, event.width, event.height)
+        
+        # Lets the bounds expire again once the watcher stops, since nothing keeps them up to date anymore
+        elif event.kind == 'stopped':
+            self.watched = False
+
+
+    def invalidateBounds(self):
+        """
+        Clears the cached client bounds so that they are re-read on the next validation
+        """
+
+        self._bounds = None
+
+
+    def validateMany(self, points):
+        """
+        Validates a batch of coordinates against the client bounds in a single vectorized check
+
+         Parameters:
+        - points (list of tuples or Point() or numpy array): The coordinates to be validated
+
+         Returns:
+        - A numpy array of booleans that are true where the matching coordinates are within the client area
+        """
+
+        # Converts the passed points into an (n, 2) array
+        coords = np.array([(point.x, point.y) if hasattr(point, 'x') else point for point in points], dtype = float).reshape(-1, 2)
+        xMin, yMin, xMax, yMax = self.getBounds()
+
+        # Checks every coordinate against the cached bounds at once
+        return (coords[:, 0] >= xMin) & (coords[:, 0] <= xMax) & (coords[:, 1] >= yMin) & (coords[:, 1] <= yMax)
+
+
     def isNotOutOfBounds(self, x, y):
         """
         Validates whether or not the passed coordinates are within the client area or not
@@ -29,50 +133,53 @@ class MouseManager():
         - True if the passed coordinates are within the client area, else returns false
         """
         
-        # Extracts the boundary limits from the client used on the initialize of this instance
-        xMin, xMax = self.client.left, self.client.left + self.client.width
-        yMin, yMax = self.client.top, self.client.top + self.client.height
+        # Extracts the boundary limits from the cached client bounds
+        xMin, yMin, xMax, yMax = self.getBounds()
         
         # Returns true if the passed coordinates fall within the client area, else returns false
         return xMin <= x <= xMax and yMin <= y <= yMax
 
 
-    def getX():
+    def getX(self):
         """
         Returns the cursors current X position
         """
                
-        return mouse.position().x
+        return self.backend.position().x
 
 
-    def getY():
+    def getY(self):
         """
         Returns the cursors current Y position
         """
         
-        return mouse.position().y
+        return self.backend.position().y
         
 
-    def getPos():
+    def getPos(self):
         """
         Returns the cursors current position
         """
         
-        return mouse.position()
+        return self.backend.position()
     
     
-    def moveTo(x, y):
+    @Debugger.timed('mouse.moveTo')
+    def moveTo(self, x, y):
         """
-        Moves the mouse cursor to the passed location
+        Moves the mouse cursor to the passed location, this blocks until the cursor arrives so use self.actions.move() for a non-blocking move
         
          Parameters:
         - x, y (ints or Point()): The x and y position that the cursor should be moved to
         """
 
-        mouse.moveTo(x, y, 1.5, mouse.easeInQuad)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            # Generates a path from the current position whose duration is scaled to the distance travelled, then plays it
+            self.trajectory.play(self.trajectory.path(self.getPos(), (x, y)), self.backend.moveTo)
     
     
-    def moveToRelative(offsetX, offsetY):
+    def moveToRelative(self, offsetX, offsetY):
         """
         Moves the mouse cursor to the relative position offset from its current location
         
@@ -80,9 +187,12 @@ class MouseManager():
         - x, y (ints or Point()): The offset x and y position that the cursor should be moved to relative to the current mouse position
         """
 
-        mouse.moveRelTo(offsetX, offsetY, 1.5, mouse.easeInQuad)
+        # Fetches the current position so the offset can be converted into an absolute target
+        x, y = self.getPos()
+        self.moveTo(x + offsetX, y + offsetY)
         
 
+    @Debugger.timed('mouse.click')
     def click(self, x = None, y = None, numClicks = 1, delay = 0.25, button = 'left'):
         """
         Clicks the passed mouse button a specified amount of times with the passed amount of time inbetween each click at the passed or current mouse location
@@ -94,27 +204,149 @@ class MouseManager():
         - button (optional str): A string representing which mouse button should be pressed on method call. (This is 'left' by default but 'middle' and 'right' are also valid keyword arguments)
         """
         
-        try:
-            # Validates passed coordinates
-            x, y = self.validateCoords(x, y)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            try:
+                # Validates passed coordinates
+                x, y = self.validateCoords(x, y)
 
-            # Defines the accepted button parameters for error checking
-            validButtons = ['left', 'middle', 'right']
+                # Defines the accepted button parameters for error checking
+                validButtons = ['left', 'middle', 'right']
 
-            # Ensures a valid button keyword argument is passed
-            if button in validButtons:
-                # Performs click action using the passed parameters
-                mouse.click(x, y, numClicks, delay, button)
+                # Ensures a valid button keyword argument is passed
+                if button in validButtons:
+                    # Performs click action using the passed parameters
+                    self.backend.click(x, y, button, numClicks, delay)
             
-            # Else if an invalid button keyword argument is passed 
-            else:
-                # Raises a value error exception
-                raise ValueError(f'Invalid button parameter passed: {button}, valid buttons are {validButtons}')
+                # Else if an invalid button keyword argument is passed 
+                else:
+                    # Raises a value error exception
+                    raise ValueError(f'Invalid button parameter passed: {button}, valid buttons are {validButtons}')
                 
-        # If an exception is raised
-        except Exception as e:
-            # Returns the error message
-            return(e)
+            # If an exception is raised
+            except Exception as e:
+                # Returns the error message
+                return(e)
+
+
+    @Debugger.timed('mouse.clickSequence')
+    def clickSequence(self, points, pattern = 'nearest', jitter = 0, stepDelay = 0.03, button = 'left'):
+        """
+        Clicks a batch of points in a single stream, validating them all up front and ordering them to minimize the distance travelled
+        
+         Parameters:
+        - points (list of tuples or Point()): The coordinates to be clicked
+        - pattern (optional str): The order to click the points in, 'given' keeps the passed order, 'nearest' always moves to the 
+          closest remaining point and 'tsp' further shortens the nearest neighbour route with 2-opt (default = 'nearest')
+        - jitter (optional int): The maximum random offset in pixels applied to each click to avoid clicking the exact same pixel every time (default = 0)
+        - stepDelay (optional float or list of floats): The time in seconds to wait after each click, either one value for every step or one value per point (default = 0.03)
+        - button (optional str): The mouse button to click with, either 'left', 'middle' or 'right' (default = 'left')
+        
+         Returns:
+        - An error message if the points could not be clicked, else returns None
+        """
+        
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            try:
+            
+                # Returns early if there is nothing to click
+                if len(points) == 0:
+                    return
+            
+                # Validates every point at once before any of them are clicked
+                valid = self.validateMany(points)
+                if not valid.all():
+                    raise ValueError(f'{int((~valid).sum())} of the passed click sequence coordinates are out of bounds!')
+            
+                # Ensures a valid button keyword argument is passed
+                if button not in ('left', 'middle', 'right'):
+                    raise ValueError(f'Invalid button parameter passed: {button}, valid buttons are {["left", "middle", "right"]}')
+            
+                # Converts the points into an array and orders them starting from the current mouse position
+                coords = np.array([(point.x, point.y) if hasattr(point, 'x') else point for point in points], dtype = float).reshape(-1, 2)
+                order = self.orderPoints(coords, self.getPos(), pattern)
+            
+                # Expands a single step delay into one delay per point
+                delays = [stepDelay] * len(order) if isinstance(stepDelay, (int, float)) else list(stepDelay)
+            
+                # Applies the random jitter to every point, keeping each one inside the client area
+                if jitter:
+                    xMin, yMin, xMax, yMax = self.getBounds()
+                    coords = coords + np.random.randint(-jitter, jitter + 1, coords.shape)
+                    coords[:, 0] = coords[:, 0].clip(xMin, xMax)
+                    coords[:, 1] = coords[:, 1].clip(yMin, yMax)
+            
+                # Streams each point to the input backend, moving along a trajectory then clicking
+                position = self.getPos()
+                for step, index in enumerate(order):
+                
+                    x, y = int(coords[index, 0]), int(coords[index, 1])
+                    self.trajectory.play(self.trajectory.path(position, (x, y)), self.backend.moveTo)
+                    self.backend.click(x, y, button)
+                    position = (x, y)
+                
+                    # Waits for this step's delay before moving on to the next point
+                    if delays[step] > 0 and self.backend.realtime:
+                        time.sleep(delays[step])
+        
+            # If an exception is raised
+            except Exception as e:
+                # Returns the error message
+                return(e)
+
+
+    def orderPoints(self, coords, start, pattern = 'nearest'):
+        """
+        Returns the order in which the passed coordinates should be visited
+        
+         Parameters:
+        - coords (numpy array): The (n, 2) array of coordinates to order
+        - start (tuple of ints): The position that the route starts from
+        - pattern (optional str): Either 'given', 'nearest' or 'tsp', see clickSequence() for more information (default = 'nearest')
+        
+         Returns:
+        - A list of indices into the passed coordinates
+        """
+        
+        # Keeps the passed order
+        if pattern == 'given':
+            return list(range(len(coords)))
+        
+        # Raises an error if an unknown pattern was passed
+        if pattern not in ('nearest', 'tsp'):
+            raise ValueError(f'Invalid click pattern \"{pattern}\" was passed, valid patterns are {["given", "nearest", "tsp"]}')
+        
+        # Builds the nearest neighbour route by always visiting the closest remaining point next
+        remaining = list(range(len(coords)))
+        order = []
+        position = np.asarray(start, dtype = float)
+        while remaining:
+            distances = np.hypot(*(coords[remaining] - position).T)
+            order.append(remaining.pop(int(distances.argmin())))
+            position = coords[order[-1]]
+        
+        # Further shortens the route by reversing any segment that reduces the total distance (2-opt)
+        if pattern == 'tsp':
+            route = np.vstack([np.asarray(start, dtype = float), coords])
+            order = [index + 1 for index in order]
+            distance = lambda a, b: float(np.hypot(*(route[a] - route[b])))
+            improved = True
+            while improved:
+                improved = False
+                for i in range(len(order) - 1):
+                    previous = order[i - 1] if i > 0 else 0
+                    for j in range(i + 1, len(order)):
+                        following = order[j + 1] if j + 1 < len(order) else None
+                        # Compares the edges around the segment before and after reversing it
+                        before = distance(previous, order[i]) + (distance(order[j], following) if following is not None else 0)
+                        after = distance(previous, order[j]) + (distance(order[i], following) if following is not None else 0)
+                        if after < before - 1e-9:
+                            order[i:j + 1] = reversed(order[i:j + 1])
+                            improved = True
+            order = [index - 1 for index in order]
+        
+        return order
 
 
     def leftClick(self, x = None, y = None):
@@ -145,15 +377,18 @@ class MouseManager():
         Double clicks at the current or passed x, y coordinates with a 0.25 second delay inbetween clicks
         """
         
-        # Validates the passed coordinates
-        x, y = self.validateCoords(x, y)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            # Validates the passed coordinates
+            x, y = self.validateCoords(x, y)
         
-        # If x and y coordinates were successfully validated
-        if x and y:
-            # Double clicks at the passed x and y position or current mouse position if none was passed
-            mouse.doubleClick(x, y)
+            # If x and y coordinates were successfully validated
+            if x and y:
+                # Double clicks at the passed x and y position or current mouse position if none was passed
+                self.backend.click(x, y, 'left', 2)
 
 
+    @Debugger.timed('mouse.dragTo')
     def dragTo(self, endX, endY, startX = None, startY = None):
         """
         Clicks and drags mouse from the current cursor position or passed startX and startY coordinates to the passed endX and endY coordinates
@@ -163,19 +398,23 @@ class MouseManager():
         - startX, startY (optional ints or Point()): The position at which the dragging will start, if no start coordinates are passed, this will default to the current mouse position
         """
         
-        # Validates the starting coordinates
-        startX, startY = self.validateCoords(startX, startY)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            # Validates the starting coordinates
+            startX, startY = self.validateCoords(startX, startY)
 
-        # Ensures that the passed coordinates are valid
-        if startX and startY:
-            # Moves the mouse to the start position before commencing the drag
-            self.MoveTo(startX, startY)
+            # Ensures that the passed coordinates are valid
+            if startX and startY:
+                # Moves the mouse to the start position before commencing the drag
+                self.moveTo(startX, startY)
             
-        # Calls the pyautogui dragTo function to handle the drag action
-        mouse.dragTo(endX, endY)
+            # Holds the left button down, moves along a trajectory to the end position and then releases it
+            self.backend.mouseDown()
+            self.trajectory.play(self.trajectory.path(self.getPos(), (endX, endY)), self.backend.moveTo)
+            self.backend.mouseUp(endX, endY)
         
 
-    def scrollUp(scrollAmount, x = None, y = None):
+    def scrollUp(self, scrollAmount, x = None, y = None):
         """
         Scrolls up by the passed amount of clicks. Optionally, if x and y values are passed, moves the mouse to that location prior to scrolling
         
@@ -184,10 +423,12 @@ class MouseManager():
         - x, y (optional ints or Point()): The position to move the mouse cursor to before scrolling
         """
             
-        mouse.scroll(scrollAmount, x, y)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            self.backend.scroll(scrollAmount, x, y)
         
 
-    def scrollDown(scrollAmount, x = None, y = None):
+    def scrollDown(self, scrollAmount, x = None, y = None):
         """
         Scrolls down by the passed amount of clicks. Optionally, if x and y values are passed, moves the mouse to that location prior to scrolling
         
@@ -196,7 +437,9 @@ class MouseManager():
         - x, y (optional ints or Point()): The position to move the mouse cursor to before scrolling
         """
             
-        mouse.scroll((scrollAmount * -1), x, y)
+        # Holds the shared input lock so that no other session can move the mouse during this action
+        with self.inputLock:
+            self.backend.scroll((scrollAmount * -1), x, y)
      
     def validateCoords(self, x, y):
         """
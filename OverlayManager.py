@@ -1,11 +1,28 @@
 # Imports QtWidget/QApplication classes which are required to execute this classes event-loop
 from PyQt5.QtWidgets import QApplication, QWidget
 # Imports QtGui classes that handle drawing overlays and text to the screen
-from PyQt5.QtGui import QFont, QFontMetricsF, QPainter, QColor
+from PyQt5.QtGui import QFont, QFontMetricsF, QImage, QPainter, QColor, QPen, QRegion
 # Imports QtCore classes that handle the creation of shapes and timers
-from PyQt5.QtCore import QRect, QRectF, Qt, QTimer
+from PyQt5.QtCore import QPoint, QRect, QRectF, Qt, QThread, QTimer, pyqtSignal
+# Imports the heapq and time libraries which the expiry scheduler uses to order and time its deadlines
+import heapq
+import itertools
+import time
+from collections import deque, namedtuple
+import numpy as np
 # Imports the deepcopy class from the copy library to make deepcopies of our lists
 from copy import deepcopy as deepcopy
+# Imports the debug channel which queues, merges and prioritizes the debug messages waiting to be displayed
+from DebugChannel import DebugChannel
+# Imports the detection bridge which carries detection batches from worker threads onto the GUI thread
+from DetectionBridge import DetectionBridge
+# Imports the debugger class to time this classes hot paths while timing is enabled
+from Debugger import Debugger
+
+
+
+# Client geometry that can be passed instead of a real luna client, e.g. to render overlays offscreen without a game window
+ClientGeometry = namedtuple('ClientGeometry', ['left', 'top', 'width', 'height'])
 
 
 
@@ -20,10 +37,24 @@ class OverlayManager(QWidget):
     and to inform the user of the current action that the bot is performing
     """
     
+    # Signal that carries window geometry events from the watcher thread onto the GUI thread
+    windowEvent = pyqtSignal(object)
+    # Signal that carries debug messages added from worker threads onto the GUI thread
+    debugRequested = pyqtSignal(object, object, object, object)
+    # Signals that carry overlays added and cleared from worker threads onto the GUI thread
+    overlayRequested = pyqtSignal(tuple)
+    overlayClearRequested = pyqtSignal(object, object)
+    debugClearRequested = pyqtSignal(object)
+    
 
-    def __init__(self, lunaClient, *args, **kwargs):
+    def __init__(self, lunaClient, *args, maxFps = 30, offscreen = False, **kwargs):
         """
         Method that creates/initializes any instance variables that this class may require
+        
+         Parameters:
+        - lunaClient (Win32Window or ClientGeometry): The client that the overlays and debug messages are drawn over
+        - maxFps (optional int): The maximum number of times per second that the overlay is repainted (default = 30)
+        - offscreen (optional bool): True if the overlay should never be shown and is instead rendered into images with renderFrame() (default = False)
         """
         
         try:
@@ -43,25 +74,64 @@ class OverlayManager(QWidget):
             self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
             # Sets attribute for a translucent background
             self.setAttribute(Qt.WA_TranslucentBackground)
-            # Ensures the canvas is visible
-            self.show()
+            # Stores whether this overlay renders offscreen, along with the time taken by the most recent offscreen renders
+            self.offscreen = offscreen
+            self.frameTimes = deque(maxlen = 600)
+            self.frameCount = 0
+            # Ensures the canvas is visible, unless it is only rendered offscreen
+            if not offscreen:
+                self.show()
             
             # Initializes other necessary instance attributes
             
-            # Creates a debug list which queues any debug messages needing to be displayed
-            self.debugMsgList = []
-            # Stores the timer that is used to remove debug messages after a set amount of time
-            self.debugTimer = QTimer()    
+            # Creates a bounded debug channel which queues any debug messages needing to be displayed
+            self.debugChannel = DebugChannel()
+            # Stores the entry ID and text of the debug message currently on the screen
+            self.displayedId, self.displayedMsg = None, None
+            # Creates the single expiry scheduler that removes every debug message and overlay group after their delay
+            self.expiry = ExpiryScheduler(self)
             # Returns true if there is no self debugMsg currently being displayed
             self.debugCleared = False
-            # Creates an overlay list which queues any debug messages needing to be displayed
-            self.overlayList = []
+            # Stores every overlay group keyed by its ID as a tuple of its bounding box, border thickness and grid slots
+            self.overlayGroups = {}
+            # Generates the IDs of new overlay groups, this is safe to use from any thread, and stores the ID of the last one added
+            self.overlayIds = itertools.count(1)
+            self.lastOverlayId = 0
+            # Caches the list of groups to draw, this is only rebuilt when a group is added or removed
+            self.drawList = None
             # Returns true if there are no overlays being displayed
             self.overlaysCleared = False
-            # Stores the overlay that is used to remove debug messages after a set amount of time
-            self.overlayTimer = QTimer()
+            # Stores whether the event loop is quit once every debug message and overlay has expired, this is turned off while a
+            # BotRuntime or Pipeline drives the script since they keep queueing work for the event loop to render
+            self.autoClose = True
             # Sets a default overlay/debug color to prevent the paintEvent trying to paint with an undefined color
             self.debugColor = self.overlayColor = QColor(Qt.white)
+            # Caches the debug font, its metrics and the pens so that they are not rebuilt on every paint
+            self.debugFont = QFont("Arial", 9)
+            self.debugMetrics = QFontMetricsF(self.debugFont)
+            self.debugPen = QPen(self.debugColor)
+            # Caches an overlay pen for every border thickness in use, along with the thickest border so dirty areas can include it
+            self.overlayPens = {}
+            self.maxThickness = 2
+            # Collects the areas that need repainting so that only they are repainted, at most maxFps times per second
+            self.dirtyRegion = QRegion()
+            self.renderTimer = QTimer(self)
+            self.renderTimer.setSingleShot(True)
+            self.renderTimer.setInterval(int(1000 / maxFps))
+            self.renderTimer.timeout.connect(self.__flushDirty)
+            # Applies any window geometry events on the GUI thread, since widgets can not be moved from the watcher thread
+            self.windowEvent.connect(self.__applyWindowEvent)
+            # Adds any debug messages sent from worker threads on the GUI thread, since timers can not be started from other threads
+            self.debugRequested.connect(self.addDebug)
+            self.debugClearRequested.connect(self.clearDebug)
+            # Adds and clears any overlays sent from worker threads on the GUI thread for the same reason
+            self.overlayRequested.connect(self.__applyOverlay)
+            self.overlayClearRequested.connect(self.clearOverlay)
+            # Creates the bridge that worker threads publish detections through, only the latest batch of each channel is drawn
+            self.detections = DetectionBridge(self)
+            self.detections.batchReady.connect(self.__applyDetections)
+            # Stores the batch being drawn for each channel as a tuple of its bounding box, pen, boxes, score labels and blobs
+            self.detectionGroups = {}
         
         # Catches any errors gracefully
         except Exception as e:
@@ -70,6 +140,7 @@ class OverlayManager(QWidget):
             print(f'Init exception raised: {e}')
 
         
+    @Debugger.timed('overlay.paint')
     def paintEvent(self, event):
         """
         Overrides the default paintEvent to draw the overlays/debug messages to the screen on paint
@@ -85,15 +156,20 @@ class OverlayManager(QWidget):
             # Enables antialiasing to smooth out any jagged or pixelated lines or edges
             painter.setRenderHint(QPainter.Antialiasing)
             
-            # If there is a debug message in the drawing queue
-            if self.debugMsgList is not None:
+            # If there is a debug message in the drawing queue and it is inside the area being repainted
+            if self.displayedMsg is not None and event.region().intersects(self.__debugRect(self.displayedMsg).toAlignedRect()):
                 # Draws the debug message to the screen (if one exists)
                 self.__drawDebugMsg(painter)
                 
             # If there is an overlay in the drawing queue
-            if self.overlayList is not None:
-                # Draws each overlay in the overlayList
-                self.__drawOverlays(painter)
+            if self.overlayGroups:
+                # Draws each overlay group that is inside the area being repainted
+                self.__drawOverlays(painter, event.region())
+                
+            # If any detections have been published
+            if self.detectionGroups:
+                # Draws the latest batch of each channel that is inside the area being repainted
+                self.__drawDetections(painter, event.region())
         
         # Catches any errors gracefully
         except Exception as e:
@@ -111,28 +187,13 @@ class OverlayManager(QWidget):
         try:
             
             # Returns early if there is no debug message to paint (shouldn't be possible but doesn't hurt to check it anyway)
-            if len(self.debugMsgList) > 0:
+            if self.displayedMsg is not None:
                 
-                # Sets the text properties of the debug message (font style and font size)
-                font = QFont("Arial", 9)
-                # Sets the outline color of the overlay grid to match the default color unless another color has been passed
-                painter.setPen(self.debugColor)
-                # Applies debug messages text properties to the painter
-                painter.setFont(font)
-        
-                # Defines the texts location and size
-                textWidth = QFontMetricsF(font).width(self.debugMsgList[0])
-                textHeight = QFontMetricsF(font).height()
-                textX = (self.lunaClient.width - textWidth) // 2
-                textY = textHeight - textHeight / 1.5
-        
-                # Defines the textBox in which the debug message will be displayed
-                textBox = QRectF(textX, textY, textWidth + 10, textHeight + 10)
+                # Applies the cached debug pen and font to the painter
+                painter.setPen(self.debugPen)
+                painter.setFont(self.debugFont)
                 # Draws the textBox to the screen along with the passed debug message
-                painter.drawText(textBox, Qt.AlignTop | Qt.AlignLeft, self.debugMsgList[0])
-                
-                # Sets debug message bool to false since we just drew another debug message
-                self.debugCleared = not self.debugMsgList
+                painter.drawText(self.__debugRect(self.displayedMsg), Qt.AlignTop | Qt.AlignLeft, self.displayedMsg)
             
         
         # Catches any errors gracefully
@@ -142,28 +203,99 @@ class OverlayManager(QWidget):
             return (f'Error drawing debug message: {e}')
             
     
-    def addDebug(self, debugMsg, delay = 1500):
+    def __debugRect(self, debugMsg):
+        """
+        Returns the textBox in which the passed debug message is displayed, using the cached font metrics.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        # Defines the texts location and size
+        textWidth = self.debugMetrics.width(debugMsg)
+        textHeight = self.debugMetrics.height()
+        textX = (self.width() - textWidth) // 2
+        textY = textHeight - textHeight / 1.5
+        
+        # Returns the textBox in which the debug message will be displayed
+        return QRectF(textX, textY, textWidth + 10, textHeight + 10)
+    
+    
+    def __markDirty(self, rect = None):
+        """
+        Adds the passed area to the areas that need repainting and schedules a repaint if one is not already scheduled.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        
+         Parameters:
+        - rect (optional QRect or QRectF): The area that needs repainting (default = None, repaints the whole canvas)
+        """
+        
+        # Repaints the whole canvas if no area was passed
+        if rect is None:
+            rect = self.rect()
+        
+        # Converts floating point rectangles and grows the area by a few pixels so antialiased edges are repainted too
+        if isinstance(rect, QRectF):
+            rect = rect.toAlignedRect()
+        margin = self.maxThickness + 2
+        self.dirtyRegion += rect.adjusted(-margin, -margin, margin, margin)
+        
+        # Schedules a single repaint for every area marked dirty until it fires, capping the repaint rate
+        if not self.renderTimer.isActive():
+            self.renderTimer.start()
+    
+    
+    def __flushDirty(self):
+        """
+        Repaints every area that has been marked dirty since the last repaint.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        # Returns early if nothing needs repainting
+        if self.dirtyRegion.isEmpty():
+            return
+        
+        # Schedules a repaint of only the dirty areas and starts collecting again
+        self.update(self.dirtyRegion)
+        self.dirtyRegion = QRegion()
+    
+    
+    def addDebug(self, debugMsg, delay = 1500, priority = 0, key = None):
         """
-        Paints debug info to the screen to inform the user of the action currently being undertaken by the bot
+        Paints debug info to the screen to inform the user of the action currently being undertaken by the bot, repeated
+        messages are merged into the one already queued instead of being queued again
         
          Parameters:
         - debugMsg (str): The debug message to be displayed at the top of the game client to inform the user of the current process being performed
         - delay (optional int): The time in milliseconds before the overlay is automatically removed (default = 1500, None = Permanent)
+        - priority (optional int): Messages with a higher priority are displayed before any lower priority messages (default = 0)
+        - key (optional hashable): If passed, this message replaces the previous message with the same key, e.g. a status line that updates every tick (default = None)
+        
+         Returns:
+        - The entry ID of the queued debug message, or None if it was sent from a worker thread to be added on the GUI thread
         """
         
         try:
             
-            # Returns early if there is no debug messages to display
-            if debugMsg is None and self.debugMsgList is None:
+            # Queues the message onto the GUI thread if it was sent from a worker thread, e.g. from a BotRuntime tick
+            if QThread.currentThread() is not self.thread():
+                self.debugRequested.emit(debugMsg, delay, priority, key)
                 return
             
-            # Adds the passed debug message to the message list to queue it
-            self.debugMsgList.append(debugMsg)
+            # Returns early if there is no debug message to display
+            if debugMsg is None:
+                return
+            
+            # Posts the passed debug message to the channel, a repeat of a waiting message returns the existing entry
+            entryId = self.debugChannel.post(debugMsg, priority, key)
             # Sets debugCleared bool to False since we just added a debug message to the queue
             self.debugCleared = False
             
-            # Creates a timer to remove this debug message after the passed amount of time (ms)
-            self.debugTimer.singleShot(delay, self.clearDebug)
+            # Schedules this debug message to be removed after the passed amount of time (ms), a repeated message restarts its timer
+            if delay is not None:
+                self.expiry.schedule(('debug', entryId), delay, lambda: self.clearDebug(entryId))
+            
+            # Repaints the debug message area if the displayed message changed, repaints are capped by the render timer
+            self.__refreshDebug()
+            return entryId
 
         # Catches any errors gracefully
         except Exception as e:
@@ -172,26 +304,55 @@ class OverlayManager(QWidget):
             return (f'Error adding debug message: {e}')
            
 
-    def clearDebug(self):
+    def clearDebug(self, entryId = None):
         """
-        Method to remove the debug message from the screen after it's timer has expired
+        Method to remove a debug message from the screen after it's timer has expired
+        
+         Parameters:
+        - entryId (optional int): The entry ID of the debug message to remove (default = None, removes the message currently displayed)
         """
         
-        # Checks if the debug message list has any messages in the queue
-        if self.debugMsgList: 
-            
-            # Sets the message at the start of the queue to an empty string
-            self.debugMsgList[0] = None
-            # Repaints this control to remove the current debug message from the screen before deleting it otherwise it will stay there permanently
-            self.update()
-            # Pops the first element of the debugMsgList
-            self.debugMsgList.pop(0)
-            
-        # Sets debug cleared bool to true if the debug message list is now empty
-        self.debugCleared = not self.debugMsgList
+        # Queues the removal onto the GUI thread if it was sent from a worker thread, since timers can only be stopped from their own thread
+        if QThread.currentThread() is not self.thread():
+            self.debugClearRequested.emit(entryId)
+            return
+        
+        # Defaults to the message currently being displayed
+        if entryId is None:
+            entryId = self.displayedId
+        
+        # Removes the message from the channel and cancels its timer (if it is still pending)
+        self.debugChannel.remove(entryId)
+        self.expiry.cancel(('debug', entryId))
+        # Displays the next queued debug message (if one exists)
+        self.__refreshDebug()
+            
+        # Sets debug cleared bool to true if the debug channel is now empty
+        self.debugCleared = not self.debugChannel
         # Attempts to exit this instance
         self.tryClose()
         
+    
+    def __refreshDebug(self):
+        """
+        Method that marks the old and new debug message areas dirty if the message that should be displayed has changed.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        entryId, debugMsg = self.debugChannel.current()
+        
+        # Returns early if the displayed message is unchanged, so merged repeats cost no repaint at all
+        if entryId == self.displayedId and debugMsg == self.displayedMsg:
+            return
+        
+        # Marks the area of the old and new messages dirty so the old one is removed and the new one is drawn
+        if self.displayedMsg is not None:
+            self.__markDirty(self.__debugRect(self.displayedMsg))
+        if debugMsg is not None:
+            self.__markDirty(self.__debugRect(debugMsg))
+        
+        self.displayedId, self.displayedMsg = entryId, debugMsg
+        
 
     def setDebugColor(self, newColor = 'white'):
         """
@@ -209,8 +370,10 @@ class OverlayManager(QWidget):
             
             # Sets the debug overlay paint brush to the passed color
             self.debugColor = convertedColor
-            # Calls repaint method to instantly repaint this control
-            self.repaint()
+            self.debugPen = QPen(convertedColor)
+            # Schedules a repaint of only the debug message area
+            if self.displayedMsg is not None:
+                self.__markDirty(self.__debugRect(self.displayedMsg))
          
         # Else if passed color is not of the correct type
         else:
@@ -218,29 +381,32 @@ class OverlayManager(QWidget):
             return (f'Failed to set debug overlay color - Invalid QColor of \"{newColor}" was passed!')       
         
     
-    def __drawOverlays(self, painter):
+    def __drawOverlays(self, painter, region):
         """
-        Method to draw each overlay currently stored in the overlayList to the screen.
+        Method to draw each overlay group currently stored in the cached draw list to the screen.
         This method has been __nameMangled to reduce accidental usage outside of this class
+        
+         Parameters:
+        - painter (QPainter): The painter to draw with
+        - region (QRegion): The area being repainted, overlay groups outside of it are skipped
         """
         
         try:
             
-            # Sets the outline color of the overlay grid to match the default color unless another color has been passed
-            painter.setPen(self.overlayColor)
+            # Rebuilds the draw list only if an overlay group has been added or removed since the last paint
+            if self.drawList is None:
+                self.drawList = [(box, self.__overlayPen(thickness), rects) for box, thickness, rects in self.overlayGroups.values()]
             
-            # Ensures the overlayList is populated before trying to iterate through it
-            if self.overlayList:
-                # For each grid (overlay) in the overlay list
-                for grid in self.overlayList:
-
-                    # Draws this grid to the screen
-                    painter.drawRect(grid)
-                    # Writes debug info to the screen informing user that an overlay is currently being cleared
-                    self.addDebug(f'Added overlay at x: {grid.x()}, y: {grid.y()}', delay = 1000)
+            # For each overlay group in the draw list
+            for box, pen, rects in self.drawList:
+                
+                # Draws every grid slot of this group in a single call if the group is inside the area being repainted
+                if region.intersects(box):
+                    painter.setPen(pen)
+                    painter.drawRects(rects)
                     
             # Sets overlays cleared bool to false since we just added some
-            self.overlaysCleared = not self.overlayList
+            self.overlaysCleared = not self.overlayGroups
             
         # Catches any errors gracefully
         except Exception as e:
@@ -248,8 +414,21 @@ class OverlayManager(QWidget):
             # Prints an informative error message to the console
             return (f'Error drawing overlay: {e}')
         
+    
+    def __overlayPen(self, thickness):
+        """
+        Returns the cached overlay pen of the passed thickness, creating it on first use.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        # Creates a pen of this thickness in the current overlay color if one has not been cached yet
+        if thickness not in self.overlayPens:
+            self.overlayPens[thickness] = QPen(self.overlayColor, thickness)
+        
+        return self.overlayPens[thickness]
+        
 
-    def addOverlay(self, overlayX = 0, overlayY = 0, overlayWidth = 200, overlayHeight = 200, overlayRows = 1, overlayColumns = 1, overlayThickness = 2, overlayDelay = 3000):
+    def addOverlay(self, overlayX = 0, overlayY = 0, overlayWidth = 200, overlayHeight = 200, overlayRows = 1, overlayColumns = 1, overlayThickness = 2, overlayDelay = 3000, overlayId = None):
         """
         Adds a new overlay on top of the game client at the specified location and size for a specified amount of time
         
@@ -262,10 +441,22 @@ class OverlayManager(QWidget):
         - overlayColumns (optional int): Number of columns in the grid layout of the overlay (default = 1)
         - overlayThickness (optional int): The thickness of the overlay border (default = 2)
         - overlayDelay (optional int): The time in milliseconds before the overlay automatically closes (default = 3000, None = Permanent)
+        - overlayId (optional hashable): The ID of this overlay group, an existing group with the same ID is replaced (default = None, a new ID is 
+          generated and stored in self.lastOverlayId)
         """
         
         try:
             
+            # Generates a new ID for this group if one was not passed, this is done before queuing so a worker thread gets its ID straight away
+            if overlayId is None:
+                overlayId = next(self.overlayIds)
+            self.lastOverlayId = overlayId
+            
+            # Queues the overlay onto the GUI thread if it was sent from a worker thread, e.g. from a BotRuntime tick
+            if QThread.currentThread() is not self.thread():
+                self.overlayRequested.emit((overlayX, overlayY, overlayWidth, overlayHeight, overlayRows, overlayColumns, overlayThickness, overlayDelay, overlayId))
+                return
+            
             # Creates a rectangle which represents the outer boundries of this grid using the passed parameters
             overlayBox = QRect(overlayX, overlayY, overlayWidth, overlayHeight)
         
@@ -274,32 +465,40 @@ class OverlayManager(QWidget):
             gridWidth = int(overlayBox.width() / overlayColumns)
             gridHeight = int(overlayBox.height() / overlayRows)
             
-            # Creates a list to collectively store any grids created into the overlay list, 
+            # Creates a list to collectively store the grid slots of this overlay as a single group, 
             # this way if multiple grids are paired together, we can remove all of them at once
-            gridRemovalList = []
+            gridGroup = []
                 
             # Draws a grid using the passed rows and columns, if no rows or columns were passed, this will create a 1x1 grid by default
             for currentRow in range(overlayRows):
                 for currentColumn in range(overlayColumns):
                     
                     # Calculates this position of the grid slot being drawn (or outline if its a 1x1 grid)
-                    gridX = overlayBox.left() + currentRow * gridWidth
-                    gridY = overlayBox.top() + currentColumn * gridHeight
-                    # Creates a rectangle representing this grid/grid slot
-                    grid = (QRect(gridX, gridY, gridWidth, gridHeight))
-                    # Adds this grid to the gridRemovalList, if this loop is creating multiple grid 
-                    # slots, this grouping allows us to remove every grid slot later, instead of the last one only
-                    gridRemovalList.append(grid)
-            
-            # Extends the overList class attribute to combine this gridRemovalList to it for painting when the paintEvent is called
-            self.overlayList.extend(gridRemovalList)
+                    gridX = overlayBox.left() + currentColumn * gridWidth
+                    gridY = overlayBox.top() + currentRow * gridHeight
+                    # Adds a rectangle representing this grid/grid slot to the group
+                    gridGroup.append(QRect(gridX, gridY, gridWidth, gridHeight))
+            
+            # Removes any existing group with the same ID so that it is replaced
+            if overlayId in self.overlayGroups:
+                self.__markDirty(self.overlayGroups.pop(overlayId)[0])
+            
+            # Stores the group under its ID and invalidates the cached draw list so it is rebuilt on the next paint
+            self.overlayGroups[overlayId] = (overlayBox, overlayThickness, gridGroup)
+            self.drawList = None
+            self.maxThickness = max(self.maxThickness, overlayThickness)
+            # Schedules a repaint of only the area covered by this overlay
+            self.__markDirty(overlayBox)
             # Sets overlays cleared bool to False again since we just added one
             self.overlaysCleared = False
             
-            # Starts a single shot timer that will clear this grid after the passed overlayDelay in ms has passed.
-            # Note: The "lambda:" expression is preventing the clearOverlay parameters from being prematurely 
+            # Schedules this group to be cleared after the passed overlayDelay in ms has passed (unless it is permanent), replacing any
+            # expiry of a group with the same ID. Note: The "lambda:" expression is preventing the clearOverlay parameters from being prematurely 
             # evaluated, I don't think it would matter in this situation but it's good practice.
-            self.overlayTimer.singleShot(overlayDelay, lambda: self.clearOverlay(gridRemovalList)) 
+            if overlayDelay is not None:
+                self.expiry.schedule(('overlay', overlayId), overlayDelay, lambda: self.clearOverlay(overlayId, overlayBox))
+            else:
+                self.expiry.cancel(('overlay', overlayId))
                         
         # Catches any errors gracefully
         except Exception as e:
@@ -310,37 +509,44 @@ class OverlayManager(QWidget):
             return (f'Error adding overlay: {e}')
 
 
-    def clearOverlay(self, gridRemovalList):
+    def __applyOverlay(self, overlayArgs):
+        """
+        Adds an overlay that was sent from a worker thread, this is called on the GUI thread.
+        This method has been __nameMangled to reduce accidental usage outside of this class
         """
-        Method to remove an overlay from the screen after its timer has expired
+        
+        self.addOverlay(*overlayArgs)
+
+
+    def clearOverlay(self, overlayId, overlayBox = None):
+        """
+        Method to remove an overlay group from the screen after its timer has expired
         
          Parameters:
-        - grid (QRect): The grid/grid slot to remove from the overlayList
-        - gridRemovalList (List[QRect]): A list containing a group of grids/grid slots to remove from the overlayList
+        - overlayId (hashable): The ID of the overlay group to remove
+        - overlayBox (optional QRect): Only removes the group if it still covers this box, this prevents the timer of a replaced group from removing its replacement
         """
         
         try:
             
-            # If the overlay list is empty
-            if self.overlaysCleared is False:
-                # Iterates through the passed list of overlay grids and removes them one-by-one
-                for grid in gridRemovalList:
-                    # Ensure the passed grid removal list is not empty to prevent index errors
-                    if gridRemovalList:
-                        # Writes debug info to the screen informing user that an overlay is currently being cleared
-                        self.addDebug(f'Removed overlay at x: {grid.x()}, y: {grid.y()}', delay = 1000)
-                        # Removes the last element of the grid removal list
-                        self.overlayList.remove(grid)
-            
-                    # Else if gridRemovalList is empty
-                    else:
-                        # Breaks out of the loop since there are no more overlays to remove
-                        break
+            # Queues the removal onto the GUI thread if it was sent from a worker thread, since timers can only be stopped from their own thread
+            if QThread.currentThread() is not self.thread():
+                self.overlayClearRequested.emit(overlayId, overlayBox)
+                return
+            
+            # Removes the group in a single dictionary operation if it still exists (and has not been replaced)
+            group = self.overlayGroups.get(overlayId)
+            if group is not None and (overlayBox is None or group[0] == overlayBox):
+                
+                del self.overlayGroups[overlayId]
+                # Cancels the groups expiry in case it is being cleared early
+                self.expiry.cancel(('overlay', overlayId))
+                # Invalidates the cached draw list and marks the area of the group dirty so it is removed from the screen
+                self.drawList = None
+                self.__markDirty(group[0])
                
-            # Updates the canvas which will draw all of the overlays contained within the list
-            self.repaint()
             # Returns true if there are no overlays left to display
-            self.overlaysCleared = not self.overlayList
+            self.overlaysCleared = not self.overlayGroups
             # Attempts to exit this instance
             self.tryClose()
             
@@ -348,9 +554,9 @@ class OverlayManager(QWidget):
         except Exception as e:
             
             # Informs user that an error has occured
-            self.addDebug('Error adding overlay! Please see console output for more information...')
+            self.addDebug('Error clearing overlay! Please see console output for more information...')
             # Prints an informative error message to the console
-            return (f'Error adding overlay: {e}')
+            return (f'Error clearing overlay: {e}')
     
     
     def setOverlayColor(self, newColor = 'white'):
@@ -368,6 +574,12 @@ class OverlayManager(QWidget):
         if convertedColor.isValid():
             # Sets the overlay paint brush to the passed color
             self.overlayColor = convertedColor
+            # Clears the cached pens and draw list so that they are rebuilt in the new color
+            self.overlayPens = {}
+            self.drawList = None
+            # Schedules a repaint of every overlay group so that they are redrawn in the new color
+            for box, thickness, rects in self.overlayGroups.values():
+                self.__markDirty(box)
         
         # Else if passed color is not of the correct type
         else:
@@ -375,17 +587,373 @@ class OverlayManager(QWidget):
             return (f'Failed to set overlay color - Invalid QColor of \"{newColor}" was passed!')
     
     
+    def publishDetections(self, channel, boxes = None, scores = None, blobs = None, color = None):
+        """
+        Publishes a batch of detections to be drawn on the passed channel, replacing the previous batch of that channel.
+        This is safe to call from any thread and never blocks, see DetectionBridge.publish() for the parameters
+        """
+        
+        self.detections.publish(channel, boxes, scores, blobs, color)
+        
+    
+    def clearDetections(self, channel = None):
+        """
+        Removes the detections of the passed channel from the screen, this must be called on the GUI thread
+        
+         Parameters:
+        - channel (optional str): The channel to remove (default = None, removes every channel)
+        """
+        
+        # Removes every channel if none was passed
+        for channel in (list(self.detectionGroups) if channel is None else [channel]):
+            
+            group = self.detectionGroups.pop(channel, None)
+            # Marks the area of the removed batch dirty so it is removed from the screen
+            if group is not None:
+                self.__markDirty(group[0])
+        
+    
+    def __applyDetections(self, channel):
+        """
+        Takes the latest batch published to the passed channel and schedules a repaint of the area it covers.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        batch = self.detections.take(channel)
+        
+        # Returns early if the batch was already taken by an earlier signal
+        if batch is None:
+            return
+        
+        # Marks the area of the previous batch of this channel dirty so it is removed
+        self.clearDetections(channel)
+        
+        # Returns early if the batch is empty, this clears the channel
+        if not len(batch.boxes) and not len(batch.blobs):
+            return
+        
+        # Computes the bounding box of every box and blob in the batch in a single pass over each array
+        corners = np.concatenate((batch.boxes[:, :2], batch.boxes[:, :2] + batch.boxes[:, 2:], batch.blobs - 3, batch.blobs + 3))
+        left, top = corners.min(axis = 0)
+        right, bottom = corners.max(axis = 0)
+        box = QRect(int(left), int(top) - 14 * (batch.scores is not None), int(right - left), int(bottom - top) + 14 * (batch.scores is not None))
+        
+        # Converts the batch to Qt shapes once here so that every repaint only has to draw them
+        color = QColor(batch.color) if batch.color is not None else self.overlayColor
+        rects = [QRect(*map(int, row)) for row in batch.boxes]
+        labels = [] if batch.scores is None else [(QPoint(int(row[0]), int(row[1]) - 3), f'{score:.2f}') for row, score in zip(batch.boxes, batch.scores)]
+        blobs = [QPoint(*map(int, row)) for row in batch.blobs]
+        
+        self.detectionGroups[channel] = (box, QPen(color, 2), rects, labels, blobs)
+        self.__markDirty(box)
+        
+    
+    def __drawDetections(self, painter, region):
+        """
+        Method to draw the latest detection batch of each channel to the screen.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        
+         Parameters:
+        - painter (QPainter): The painter to draw with
+        - region (QRegion): The area being repainted, channels outside of it are skipped
+        """
+        
+        try:
+            
+            painter.setFont(self.debugFont)
+            
+            # For each channel that is inside the area being repainted
+            for box, pen, rects, labels, blobs in self.detectionGroups.values():
+                
+                if not region.intersects(box):
+                    continue
+                
+                # Draws every box and blob of this channel in a single call each, followed by any score labels
+                painter.setPen(pen)
+                painter.drawRects(rects)
+                for point in blobs:
+                    painter.drawEllipse(point, 3, 3)
+                for point, label in labels:
+                    painter.drawText(point, label)
+                    
+        # Catches any errors gracefully
+        except Exception as e:
+            
+            # Prints an informative error message to the console
+            return (f'Error drawing detections: {e}')
+        
+    
+    def onWindowEvent(self, event):
+        """
+        Receives a GeometryEvent from the window managers geometry watcher, this is safe to call from any thread
+        """
+        
+        # Emits the event so that it is queued onto the GUI thread
+        self.windowEvent.emit(event)
+        
+    
+    def __applyWindowEvent(self, event):
+        """
+        Moves and resizes the transparent canvas to match the client whenever it is moved or resized.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        # Only moves and resizes change the canvas geometry
+        if event.kind in ('moved', 'resized'):
+            self.setGeometry(event.left, event.top, event.width, event.height)
+    
+    
+    @Debugger.timed('overlay.render')
+    def renderFrame(self, background = None):
+        """
+        Renders the current debug message and overlays into an image instead of onto the screen, this works under the Qt
+        offscreen platform so overlay performance can be measured without a window
+        
+         Parameters:
+        - background (optional numpy array): An RGB frame to draw the overlays on top of, e.g. a replayed frame (default = None, transparent)
+        
+         Returns:
+        - A QImage the size of the client containing the rendered overlays
+        """
+        
+        startTime = time.perf_counter()
+        
+        # Creates a transparent image the size of the client, or a copy of the passed frame to draw on top of
+        if background is None:
+            image = QImage(self.lunaClient.width, self.lunaClient.height, QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+        else:
+            background = np.ascontiguousarray(background[:, :, :3])
+            image = QImage(background.data, background.shape[1], background.shape[0], background.strides[0], QImage.Format_RGB888).copy()
+        
+        # Draws the same items that paintEvent() draws, over the whole image
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        if self.displayedMsg is not None:
+            self.__drawDebugMsg(painter)
+        if self.overlayGroups:
+            self.__drawOverlays(painter, QRegion(image.rect()))
+        if self.detectionGroups:
+            self.__drawDetections(painter, QRegion(image.rect()))
+        painter.end()
+        
+        # Records how long this frame took to render
+        self.frameTimes.append(time.perf_counter() - startTime)
+        self.frameCount += 1
+        return image
+    
+    
+    def renderArray(self, background = None):
+        """
+        Renders the current debug message and overlays with renderFrame() and returns the result as an RGB numpy array
+        
+         Parameters:
+        - background (optional numpy array): An RGB frame to draw the overlays on top of (default = None, black)
+        """
+        
+        image = self.renderFrame(background).convertToFormat(QImage.Format_RGB888)
+        # Copies the image pixels into an array, dropping the padding at the end of each image line
+        pixels = np.frombuffer(image.constBits().asstring(image.byteCount()), np.uint8)
+        return pixels.reshape(image.height(), image.bytesPerLine())[:, :image.width() * 3].reshape(image.height(), image.width(), 3).copy()
+    
+    
+    def renderStats(self):
+        """
+        Returns a dictionary of the offscreen frame times in milliseconds along with the number of items currently being drawn
+        """
+        
+        frameTimes = 1000 * np.array(self.frameTimes) if self.frameTimes else np.zeros(1)
+        
+        return {
+            'frames': self.frameCount,
+            'meanMs': float(frameTimes.mean()),
+            'p95Ms': float(np.percentile(frameTimes, 95)),
+            'maxMs': float(frameTimes.max()),
+            'debugMessages': len(self.debugChannel),
+            'overlayGroups': len(self.overlayGroups),
+            'overlayRects': sum(len(rects) for _, _, rects in self.overlayGroups.values()),
+            'detectionBoxes': sum(len(boxes) for _, _, boxes, _, _ in self.detectionGroups.values()),
+            'detectionBlobs': sum(len(blobs) for _, _, _, _, blobs in self.detectionGroups.values()),
+        }
+    
+    
     def tryClose(self):
         """
         Method that interrupts any application exit attempts to ensure all actions have been completed first
         """
         
-        # Ensures debug message and all overlays have been cleared before exiting
-        if self.debugCleared and self.overlaysCleared:
+        # Ensures debug message and all overlays have been cleared before exiting, unless a runtime is still driving this overlay
+        if self.autoClose and self.debugCleared and self.overlaysCleared:
             
             # Writes close message to console
             print('Overlay Manager tasks complete! Exiting overlay manager...')
             # Resets overlay booleans to prevent them being true the next time this instance is used
             self.debugCleared = self.overlaysCleared = False
-            # Exits the event loop, closing this widget
-            QApplication.quit()
\ No newline at end of file
+            # Exits the event loop, closing this widget (an offscreen overlay is not driven by an event loop of its own)
+            if not self.offscreen:
+                QApplication.quit()
+
+
+
+"""       ------------------------       """
+##!         Debug Video Writer Class:        
+"""       ------------------------       """    
+
+
+class DebugVideoWriter():
+    """
+    Class that composites an offscreen OverlayManager onto replayed frames and writes them to a video file, giving an 
+    annotated recording of everything the bot saw and did
+    """
+    
+    
+    def __init__(self, overlay, path, fps = 10, fourcc = 'mp4v'):
+        """
+        Initializes the DebugVideoWriter() class
+        
+         Parameters:
+        - overlay (OverlayManager): The offscreen overlay to composite onto each frame
+        - path (str): The file path to write the video to
+        - fps (optional int): The frame rate of the written video (default = 10)
+        - fourcc (optional str): The four character code of the video codec (default = 'mp4v')
+        """
+        
+        # Imports cv2 only when a video is written since nothing else in this module needs it
+        import cv2
+        self._cv2 = cv2
+        
+        self.overlay = overlay
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (overlay.lunaClient.width, overlay.lunaClient.height))
+        
+        
+    def write(self, frame):
+        """
+        Draws the current overlays on top of the passed RGB frame and writes it to the video
+        """
+        
+        # Resizes the frame to the client size since every frame of a video must be the same size
+        if frame.shape[1] != self.overlay.lunaClient.width or frame.shape[0] != self.overlay.lunaClient.height:
+            frame = self._cv2.resize(frame, (self.overlay.lunaClient.width, self.overlay.lunaClient.height))
+        
+        self.writer.write(self._cv2.cvtColor(self.overlay.renderArray(frame), self._cv2.COLOR_RGB2BGR))
+        
+        
+    def close(self):
+        """
+        Finishes writing the video file
+        """
+        
+        self.writer.release()
+
+
+
+"""       ---------------------       """
+##!         Expiry Scheduler Class:        
+"""       ---------------------       """    
+
+
+class ExpiryScheduler():
+    """
+    Class that handles the expiry of every overlay group and debug message with a single QTimer and a heap of deadlines,
+    rather than creating a QTimer for each item. Items whose deadlines fall within the same short window are expired together
+    """
+
+
+    def __init__(self, parent = None, slack = 15):
+        """
+        Initializes the ExpiryScheduler() class
+        
+         Parameters:
+        - parent (optional QObject): The parent of the scheduler's timer (default = None)
+        - slack (optional int): Items due within this many milliseconds of each other are expired in the same batch (default = 15)
+        """
+        
+        self.slack = slack / 1000
+        # Stores every deadline as a heap of (deadline, sequence, key) tuples so the next deadline is always at the front
+        self.heap = []
+        # Maps each key to its current deadline and callback, rescheduled or cancelled keys leave stale heap entries which are skipped
+        self.entries = {}
+        # Counts the scheduled items so that heap entries with equal deadlines never compare their keys
+        self.sequence = 0
+        # Creates the single timer that fires at the next deadline
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.__expire)
+
+
+    def schedule(self, key, delay, callback):
+        """
+        Schedules the passed callback to be called after the passed delay, replacing any item already scheduled under the same key
+        
+         Parameters:
+        - key (hashable): The key identifying this item
+        - delay (int): The time in milliseconds before the item expires
+        - callback (callable): The function to call when the item expires
+        """
+        
+        deadline = time.monotonic() + delay / 1000
+        self.sequence += 1
+        self.entries[key] = (deadline, callback)
+        heapq.heappush(self.heap, (deadline, self.sequence, key))
+        
+        # Restarts the timer if this item is now the next to expire
+        if self.heap[0][2] == key:
+            self.__restart()
+
+
+    def cancel(self, key):
+        """
+        Cancels the item scheduled under the passed key (if any)
+        """
+        
+        self.entries.pop(key, None)
+
+
+    def __len__(self):
+        """
+        Returns the number of items waiting to expire
+        """
+        
+        return len(self.entries)
+
+
+    def __restart(self):
+        """
+        Starts the timer so that it fires at the next live deadline.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        # Discards stale heap entries left behind by rescheduled or cancelled items
+        while self.heap and self.entries.get(self.heap[0][2], (None,))[0] != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        
+        # Stops the timer if nothing is left to expire
+        if not self.heap:
+            self.timer.stop()
+            return
+        
+        self.timer.start(max(0, int((self.heap[0][0] - time.monotonic()) * 1000)))
+
+
+    def __expire(self):
+        """
+        Expires every item that is due (or due within the slack window) in a single batch, then restarts the timer.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        cutoff = time.monotonic() + self.slack
+        callbacks = []
+        
+        # Pops every due item off the heap, skipping stale entries
+        while self.heap and self.heap[0][0] <= cutoff:
+            deadline, sequence, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == deadline:
+                del self.entries[key]
+                callbacks.append(entry[1])
+        
+        # Calls every expired callback, their dirty areas are collected into a single repaint by the overlay manager
+        for callback in callbacks:
+            callback()
+        
+        self.__restart()
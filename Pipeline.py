@@ -0,0 +1,320 @@
+# Imports the time and threading libraries to run and measure each pipeline stage on its own thread
+import time
+import threading
+from collections import deque
+import numpy as np
+
+
+class LatestQueue():
+    """
+    Bounded queue between two pipeline stages, once it is full the oldest item is dropped so the consumer always gets the
+    most recent items and the producer never waits on it
+    """
+
+
+    def __init__(self, maxSize = 1):
+        """
+        Initializes the LatestQueue() class
+
+         Parameters:
+        - maxSize (optional int): The maximum number of items waiting in the queue (default = 1, only the latest item is kept)
+        """
+
+        self.items = deque(maxlen = maxSize)
+        # Counts the items put into the queue, the items dropped because it was full and the most items it held at once
+        self.put = self.dropped = self.maxDepth = 0
+        # Stores the total time in seconds that consumers waited for an item
+        self.waited = 0.0
+        self.closed = False
+        self._condition = threading.Condition()
+
+
+    def push(self, item):
+        """
+        Adds the passed item to the queue, dropping the oldest waiting item if the queue is full
+        """
+
+        with self._condition:
+
+            # Drops the oldest item since appending to a full deque discards it
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+
+            self.items.append(item)
+            self.put += 1
+            self.maxDepth = max(self.maxDepth, len(self.items))
+            self._condition.notify()
+
+
+    def pop(self, timeout = None):
+        """
+        Returns the oldest waiting item, waiting for one if the queue is empty
+
+         Parameters:
+        - timeout (optional float): The longest time in seconds to wait for an item (default = None, waits until one arrives or the queue is closed)
+
+         Returns:
+        - The oldest waiting item, or None if the queue was closed or the timeout expired
+        """
+
+        startTime = time.perf_counter()
+
+        with self._condition:
+
+            self._condition.wait_for(lambda: self.items or self.closed, timeout)
+            self.waited += time.perf_counter() - startTime
+            return self.items.popleft() if self.items else None
+
+
+    def close(self):
+        """
+        Closes the queue, waking every consumer waiting on it
+        """
+
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+    def stats(self):
+        """
+        Returns a dictionary of this queues depth, items put, items dropped and the total time consumers waited on it
+        """
+
+        return {'depth': len(self.items), 'maxDepth': self.maxDepth, 'put': self.put, 'dropped': self.dropped, 'waitedMs': 1000 * self.waited}
+
+
+class Pipeline():
+    """
+    Class that runs a bot as three overlapping stages instead of one tick at a time, so that the next frame is captured
+    while the previous one is being searched and throughput is limited by the slowest stage instead of the sum of them:
+
+    - Capture: One thread that captures frames from the script managers frame source
+    - Vision: A pool of threads that each call perceive(search) with a search manager bound to their frame, see SearchManager.frameView()
+    - Action: One thread that calls decide(script, percept) and then act(script, decision) on the latest percept
+
+    Each stage hands over to the next through a LatestQueue, so a slow stage causes frames to be dropped rather than queued up
+    """
+
+
+    def __init__(self, script, perceive, decide, act = None, workers = 2, captureRate = 30, adaptive = True, queueSize = 1, historySize = 300):
+        """
+        Initializes the Pipeline() class
+
+         Parameters:
+        - script (ScriptManager): The script manager that frames are captured from and actions are taken through
+        - perceive (callable): Called on a vision thread with a search manager bound to the frame, returns what was seen
+        - decide (callable): Called on the action thread with the script manager and the latest result of perceive, returns the action to take
+        - act (optional callable): Called on the action thread with the script manager and the result of decide (default = None, decide performs its own actions)
+        - workers (optional int): The number of vision threads (default = 2)
+        - captureRate (optional float): The maximum number of frames captured per second (default = 30)
+        - adaptive (optional bool): True if the capture rate should back off while the client frame is static (default = True)
+        - queueSize (optional int): The maximum number of items waiting between two stages (default = 1)
+        - historySize (optional int): The number of recent timings kept for each stage (default = 300)
+        """
+
+        self.script = script
+        self.perceive, self.decide, self.act = perceive, decide, act
+        self.workers = workers
+        self.captureRate = captureRate
+        self.adaptive = adaptive
+        # Creates the queues between the capture and vision stages, and between the vision and action stages
+        self.frameQueue = LatestQueue(queueSize)
+        self.perceptQueue = LatestQueue(queueSize)
+        # Stores the recent time taken by each stage and the time from capture to action of each frame, in seconds
+        self.timings = {stage: deque(maxlen = historySize) for stage in ('capture', 'vision', 'action', 'latency')}
+        # Counts the frames captured, the percepts acted on and the percepts discarded for being older than one already acted on
+        self.captured = self.acted = self.stale = 0
+        # Stores the error message that stopped the pipeline (if any)
+        self.error = None
+        self.running = False
+        self.startedAt = None
+        self._threads = []
+        self._stopEvent = threading.Event()
+        # Counts the vision threads still running so the last one to finish can close the percept queue
+        self._activeWorkers = 0
+        self._workerLock = threading.Lock()
+
+
+    def start(self):
+        """
+        Starts the capture, vision and action threads
+
+         Returns:
+        - This pipeline, so it can be started as it is created
+        """
+
+        self.running = True
+        self.startedAt = time.perf_counter()
+        self._stopEvent.clear()
+        self._activeWorkers = self.workers
+
+        self._threads = [threading.Thread(target = self._capture, name = 'PipelineCapture', daemon = True)]
+        self._threads += [threading.Thread(target = self._vision, name = f'PipelineVision{index}', daemon = True) for index in range(self.workers)]
+        self._threads += [threading.Thread(target = self._action, name = 'PipelineAction', daemon = True)]
+
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+
+    def stop(self, timeout = 2.0):
+        """
+        Stops every stage after its current item and waits for their threads to finish
+
+         Parameters:
+        - timeout (optional float): The longest time in seconds to wait for each thread (default = 2.0)
+        """
+
+        self.running = False
+        self._stopEvent.set()
+        self.frameQueue.close()
+        self.perceptQueue.close()
+
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+
+    def isRunning(self):
+        """
+        Returns true while any stage of the pipeline is still running
+        """
+
+        return any(thread.is_alive() for thread in self._threads)
+
+
+    def _fail(self, stage, e):
+        """
+        Records the error raised by the passed stage and stops the pipeline
+        """
+
+        self.error = f'Error in pipeline {stage} stage: {e}'
+        self.stop(0)
+
+
+    def _capture(self):
+        """
+        Captures frames at up to the capture rate until the pipeline is stopped or the frame source runs out of frames
+        """
+
+        deadline = time.perf_counter()
+
+        while self.running:
+
+            startTime = time.perf_counter()
+
+            try:
+                frame = self.script._search.frameSource()
+            except Exception as e:
+                return self._fail('capture', e)
+
+            # Closes the frame queue once the frame source runs out, letting the other stages finish the frames already captured
+            if frame is None:
+                self.frameQueue.close()
+                return
+
+            # Tracks whether the client frame is changing so the capture rate can back off while it is static
+            self.script._stall.update(frame)
+            self.captured += 1
+            self.frameQueue.push((self.captured, startTime, frame))
+            self.timings['capture'].append(time.perf_counter() - startTime)
+
+            # Waits until the next capture is due, capturing straight away if this one overran its interval
+            interval = 1 / self.captureRate
+            if self.adaptive:
+                interval = self.script.nextTickDelay(interval)
+            deadline = max(deadline + interval, time.perf_counter())
+            self._stopEvent.wait(deadline - time.perf_counter())
+
+
+    def _vision(self):
+        """
+        Searches each captured frame with perceive() and hands the result to the action stage
+        """
+
+        while self.running:
+
+            item = self.frameQueue.pop()
+
+            # Returns once the frame queue is closed and empty, closing the percept queue after the last vision thread finishes
+            if item is None:
+                with self._workerLock:
+                    self._activeWorkers -= 1
+                    if self._activeWorkers == 0:
+                        self.perceptQueue.close()
+                return
+
+            frameId, capturedAt, frame = item
+            startTime = time.perf_counter()
+
+            try:
+                percept = self.perceive(self.script._search.frameView(frame, frameId))
+            except Exception as e:
+                return self._fail('vision', e)
+
+            self.perceptQueue.push((frameId, capturedAt, percept))
+            self.timings['vision'].append(time.perf_counter() - startTime)
+
+
+    def _action(self):
+        """
+        Decides and acts on the latest percept, skipping any percept of an older frame than the last one acted on
+        """
+
+        lastFrameId = 0
+
+        while self.running:
+
+            item = self.perceptQueue.pop()
+
+            # Returns once the percept queue is closed and empty
+            if item is None:
+                self.running = False
+                return
+
+            frameId, capturedAt, percept = item
+
+            # Skips percepts that finished out of order, since a newer frame has already been acted on
+            if frameId < lastFrameId:
+                self.stale += 1
+                continue
+            lastFrameId = frameId
+
+            startTime = time.perf_counter()
+
+            try:
+                decision = self.decide(self.script, percept)
+                if self.act is not None:
+                    self.act(self.script, decision)
+            except Exception as e:
+                return self._fail('action', e)
+
+            self.acted += 1
+            self.timings['action'].append(time.perf_counter() - startTime)
+            self.timings['latency'].append(time.perf_counter() - capturedAt)
+
+
+    def stats(self):
+        """
+        Returns a dictionary of the frames captured and acted on, the throughput, the mean and 95th percentile time of each
+        stage in milliseconds, and the backpressure metrics of each queue
+        """
+
+        elapsed = time.perf_counter() - self.startedAt if self.startedAt is not None else 0.0
+        stats = {
+            'captured': self.captured,
+            'acted': self.acted,
+            'stale': self.stale,
+            'fps': self.acted / elapsed if elapsed > 0 else 0.0,
+            'frameQueue': self.frameQueue.stats(),
+            'perceptQueue': self.perceptQueue.stats(),
+        }
+
+        # Summarizes the timings of each stage
+        for stage, timings in self.timings.items():
+            timings = 1000 * np.array(timings) if timings else np.zeros(1)
+            stats[stage] = {'meanMs': float(timings.mean()), 'p95Ms': float(np.percentile(timings, 95))}
+
+        return stats
@@ -0,0 +1,207 @@
+# Imports the os and sys libraries to sample and name the stack of every running thread, and the threading library to sample from a background thread
+import os
+import sys
+import time
+import threading
+from collections import Counter
+# Imports the debugger class to log the profile summary once a profile finishes
+from Debugger import Debugger
+
+
+# Defines the (file, function) pairs that a thread is blocked in while it is idle, samples of idle threads are skipped by default
+idleFrames = {('threading.py', 'wait'), ('threading.py', 'wait_for'), ('threading.py', '_wait_for_tstate_lock'), ('queue.py', 'get'),
+              ('selectors.py', 'select'), ('Profiler.py', '_run'), ('Debugger.py', '__write')}
+
+
+class SamplingProfiler():
+    """
+    Class that samples the call stack of every bot thread at a fixed interval, without tracing every call. This makes it
+    cheap enough to switch on in a running bot. The samples can be written as collapsed stacks (one 'thread;outer;...;inner count'
+    line per unique stack), which flamegraph tools read directly, or summarized as per-function totals
+    """
+
+
+    def __init__(self, interval = 0.005, includeIdle = False):
+        """
+        Initializes the SamplingProfiler() class
+
+         Parameters:
+        - interval (optional float): The time in seconds between samples (default = 0.005, 200 samples per second)
+        - includeIdle (optional bool): True to also record threads that are blocked waiting, e.g. an idle action queue (default = False)
+        """
+
+        self.interval = interval
+        self.includeIdle = includeIdle
+        # Counts the number of samples of each unique (thread name, stack) pair, stacks are stored outermost frame first
+        self.stacks = Counter()
+        # Counts the samples taken and the ticks seen since the profile started
+        self.samples = self.ticks = 0
+        # Stores when the profile should stop, as a time and a number of ticks (None = until stop() is called)
+        self.deadline = self.maxTicks = None
+        # Stores the file path the collapsed stacks are written to when the profile finishes (if any)
+        self.outputPath = None
+        self._thread = None
+        self._stopEvent = threading.Event()
+        self._lock = threading.Lock()
+
+
+    def start(self, duration = None, maxTicks = None, outputPath = None):
+        """
+        Starts sampling every thread, clearing any previous samples
+
+         Parameters:
+        - duration (optional float): The time in seconds to sample for (default = None, samples until stop() is called)
+        - maxTicks (optional int): The number of ticks to sample for, see tick() (default = None, samples until stop() is called)
+        - outputPath (optional str): The file path to write the collapsed stacks to when the profile finishes (default = None)
+        """
+
+        # Stops any profile that is still running
+        self.stop()
+
+        self.stacks.clear()
+        self.samples = self.ticks = 0
+        self.deadline = time.perf_counter() + duration if duration is not None else None
+        self.maxTicks = maxTicks
+        self.outputPath = outputPath
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target = self._run, name = 'SamplingProfiler', daemon = True)
+        self._thread.start()
+
+
+    def stop(self):
+        """
+        Stops sampling and waits for the sampler thread to finish writing its output
+        """
+
+        self._stopEvent.set()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+    def isRunning(self):
+        """
+        Returns true while the profiler is sampling
+        """
+
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def tick(self):
+        """
+        Counts a bot tick, stopping the profile once maxTicks ticks have been sampled
+        """
+
+        # Returns early if the profile has already finished
+        if self._stopEvent.is_set():
+            return
+
+        self.ticks += 1
+
+        if self.maxTicks is not None and self.ticks >= self.maxTicks:
+            self._stopEvent.set()
+
+
+    def _run(self):
+        """
+        Sampler thread loop that samples every other thread until the profile is stopped or its duration expires
+        """
+
+        ownId = threading.get_ident()
+        nextSample = time.perf_counter()
+
+        while not self._stopEvent.is_set() and (self.deadline is None or nextSample < self.deadline):
+
+            # Maps each thread ID to its name so the samples of each thread can be told apart
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            with self._lock:
+
+                # Records the current stack of every thread except this one
+                for threadId, frame in sys._current_frames().items():
+
+                    # Skips this thread, and any thread that is blocked waiting unless idle threads are being recorded
+                    if threadId == ownId or (not self.includeIdle and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in idleFrames):
+                        continue
+
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                        frame = frame.f_back
+
+                    self.stacks[(names.get(threadId, str(threadId)), tuple(reversed(stack)))] += 1
+
+                self.samples += 1
+
+            # Waits until the next sample is due, skipping any samples missed while this one was taken
+            nextSample = max(nextSample + self.interval, time.perf_counter())
+            self._stopEvent.wait(nextSample - time.perf_counter())
+
+        # Writes the output and a summary once the profile finishes, the summary is built here so a following profile can not change it
+        if self.outputPath is not None:
+            self.writeCollapsed(self.outputPath)
+        Debugger.info(self.summary())
+        # Waits for the summary to be written, since a profile stopped at exit finishes after the debuggers own flush
+        Debugger.flush()
+
+
+    def collapsed(self):
+        """
+        Returns the samples as collapsed stack lines, 'thread;outer;...;inner count', which flamegraph tools read directly
+        """
+
+        with self._lock:
+            return [f"{threadName};{';'.join(stack)} {count}" for (threadName, stack), count in self.stacks.most_common()]
+
+
+    def writeCollapsed(self, path):
+        """
+        Writes the samples to the passed file as collapsed stack lines
+        """
+
+        with open(path, 'w', encoding = 'utf-8') as file:
+            file.write('\n'.join(self.collapsed()) + '\n')
+
+
+    def functionTotals(self, top = None):
+        """
+        Returns the functions seen in the samples, ordered by the number of samples they were running in
+
+         Parameters:
+        - top (optional int): The number of functions to return (default = None, returns every function)
+
+         Returns:
+        - A list of (function, self samples, total samples) tuples, self samples are samples that were inside the function
+        itself and total samples also include the functions it called
+        """
+
+        selfSamples, totalSamples = Counter(), Counter()
+
+        with self._lock:
+
+            for (threadName, stack), count in self.stacks.items():
+
+                if stack:
+                    selfSamples[stack[-1]] += count
+
+                # Counts each function once per stack so recursive functions are not counted more than once
+                for function in set(stack):
+                    totalSamples[function] += count
+
+        return [(function, selfSamples[function], total) for function, total in totalSamples.most_common(top)]
+
+
+    def summary(self, top = 15):
+        """
+        Returns a table of the functions with the most samples, as a percentage of every sampled thread stack
+        """
+
+        with self._lock:
+            stackSamples = sum(self.stacks.values()) or 1
+            lines = [f'Profiled {self.samples} samples over {self.ticks} ticks', f"{'self %':>8}{'total %':>9}  function"]
+
+        for function, selfCount, totalCount in self.functionTotals(top):
+            lines.append(f'{100 * selfCount / stackSamples:>8.1f}{100 * totalCount / stackSamples:>9.1f}  {function}')
+
+        return '\n'.join(lines)
@@ -1,11 +1,16 @@
-# Imports os library to 
+# Imports os library to build the paths of the image directories
 import os
-import pyautogui
 import cv2
 import numpy as np
 import time
-import Point
-from PIL import ImageGrab
+import copy
+from Point import Point
+# Imports the template store which holds every template in the domain it should be matched in
+from TemplateStore import TemplateStore
+# Imports the frame sources that the search manager captures its frames from
+from FrameSource import ScreenFrameSource
+# Imports the debugger class to time this classes hot paths while timing is enabled
+from Debugger import Debugger
 
 class SearchManager():
     
@@ -15,55 +20,358 @@ class SearchManager():
     colorList = []
     # The list of object images 
     imageList = []
+
+
+    def __init__(self, frameSource = None, templateStore = None):
+        """
+        Initializes the SearchManager() class
+
+         Parameters:
+        - frameSource (optional callable): Returns a new RGB frame each time it is called, pass a RecordedFrameSource() to run headless (default = ScreenFrameSource())
+        - templateStore (optional TemplateStore): The template store to search with, e.g. one attached from another process with TemplateStore.attach() (default = None, creates its own)
+        """
+
+        # Stores the source that every frame is captured from
+        self.frameSource = frameSource if frameSource is not None else ScreenFrameSource()
+
+        # Uses the passed template store, or creates the template store that every template is loaded into
+        self.templateStore = templateStore if templateStore is not None else TemplateStore(self.imageFolder)
+        # Stores the frame captured for the current tick in each matching domain it has been requested in
+        self.frames = {}
+        # Counts the captured frames so callers can tell if a frame belongs to the current tick
+        self.frameId = 0
+        # Stores whether the frame is held by a tick or a caller of captureFrame(), frames that are not held are only used for one search
+        self.frameHeld = False
+        # Stores the screen position of the top-left corner of the captured frames so found locations can be returned in screen coordinates
+        self.captureOffset = (0, 0)
+        # Sets the default template search mode, either 'full' or 'pyramid'
+        self.searchMode = 'full'
+        # Caches the half resolution templates used by pyramid searches
+        self.pyramidTemplates = {}
+
+
+    def setCaptureRegion(self, left, top, width, height):
+        """
+        Limits every capture to the passed area of the screen (usually the client rectangle) if the frame source supports it
+
+         Parameters:
+        - left, top (ints): The position of the top-left corner of the capture region
+        - width, height (ints): The size of the capture region
+        """
+
+        # Returns early if the frame source can not capture a region, recorded frames are already cropped
+        if not hasattr(self.frameSource, 'setRegion'):
+            return
+
+        self.frameSource.setRegion((left, top, width, height))
+        self.captureOffset = (left, top)
+
+
+    def onWindowEvent(self, event):
+        """
+        Updates the capture region from a GeometryEvent published by the window managers geometry watcher
+        """
+
+        # Only moves and resizes change the capture region
+        if event.kind in ('moved', 'resized'):
+            self.setCaptureRegion(event.left, event.top, event.width, event.height)
+    
     
-    def setDirectory(self, directory):
+    def setDirectory(self, directory, mode = 'color'):
         """
         Fetches any images from the passed directory and loads them into the local imageList
+
+         Parameters:
+        - directory (str): The directory inside the image folder to load the images from
+        - mode (optional str): The domain that the loaded templates should be matched in, either 'color', 'gray' or 'edge' (default = 'color')
         """
     
         # Iterates through the files in the passed directory
-        for filename in os.path.join(self.imageFolder, directory):
+        for filename in os.listdir(os.path.join(self.imageFolder, directory)):
             # Checks if the file is an image
-            if filename.lower().endswith('.png', '.jpg', '.jpeg', '.gif'):
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
                 # If the file is an image, add its full path to the image_list
                 self.imageList.append(os.path.join(directory, filename))
+                # Loads the template into the template store in the passed matching domain
+                self.templateStore.addTemplate(os.path.join(directory, filename), mode)
+
+
+    def setTemplateMode(self, imageName, mode):
+        """
+        Sets the domain that the passed template is matched in
+
+         Parameters:
+        - imageName (str): The filename of the template to change
+        - mode (str): The domain that the template should be matched in, either 'color', 'gray' or 'edge'
+
+         Returns:
+        - An error message if the mode could not be set, else returns None
+        """
+
+        return self.templateStore.setMode(imageName, mode)
+
+
+    @Debugger.timed('search.capture')
+    def captureFrame(self):
+        """
+        Captures a new frame of the screen for the current tick, every template search performed until the next 
+        capture or releaseFrame() shares this frame instead of taking and converting a screenshot of its own
+
+         Returns:
+        - True if a frame was captured, else returns false if the frame source has run out of frames
+        """
+
+        # Captures a frame from the frame source
+        with Debugger.span('search.grab'):
+            frame = self.frameSource()
+
+        # Returns early if the frame source has no more frames
+        if frame is None:
+            return False
+
+        # Converts the frame to BGR color format once for every template
+        self.frames = {'color': cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)}
+        # Increments the frame counter and holds the frame until it is released
+        self.frameId += 1
+        self.frameHeld = True
+        return True
+
+
+    def releaseFrame(self):
+        """
+        Releases the held frame at the end of a tick, so the next search outside of a tick captures a fresh frame instead of
+        matching against this one
+        """
+
+        self.frameHeld = False
+
+
+    def frameView(self, frame, frameId = None):
+        """
+        Returns a copy of this search manager bound to the passed frame, the copy shares every template with this search
+        manager but converts and searches its own frame, so several frames can be searched at once on different threads
+
+         Parameters:
+        - frame (numpy array): The RGB frame to bind the copy to
+        - frameId (optional int): The ID of the passed frame (default = None, keeps this search managers frame ID)
+        """
+
+        view = copy.copy(self)
+        # Converts the frame to BGR color format once for every template, as captureFrame() does
+        view.frames = {'color': cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)}
+        view.frameHeld = True
+        if frameId is not None:
+            view.frameId = frameId
+        return view
+
+
+    def getFrame(self, mode = 'color', pyramid = False):
+        """
+        Returns the current frame in the passed matching domain, converting it the first time it is requested this tick
+
+         Parameters:
+        - mode (optional str): The domain to return the frame in, either 'color', 'gray' or 'edge' (default = 'color')
+        - pyramid (optional bool): True to return the frame at half resolution for a coarse pyramid search (default = False)
+
+         Returns:
+        - The frame, or None if there is no frame and the frame source has run out of frames
+        """
+
+        # Captures a frame if none has been captured yet, this frame is not held so it is only used by the current search
+        if not self.frames:
+            captured = self.captureFrame()
+            self.frameHeld = False
+            # Returns early if the frame source has run out of frames, e.g. a recorded frame source that does not loop
+            if not captured:
+                Debugger.warning('Failed to capture a frame, the frame source has run out of frames!')
+                return
+
+        # Converts the frame into the requested domain only once per tick and shares it with all templates
+        if mode not in self.frames:
+            with Debugger.span('search.convert'):
+                self.frames[mode] = self.templateStore.convert(self.frames['color'], mode)
+
+        # Downscales the converted frame only once per tick if a pyramid level was requested
+        if pyramid:
+            if (mode, 'pyramid') not in self.frames:
+                self.frames[(mode, 'pyramid')] = cv2.pyrDown(self.frames[mode])
+            return self.frames[(mode, 'pyramid')]
+
+        return self.frames[mode]
     
 
-    def findImage(self, imageName, threshold = 0.8):
+    @Debugger.timed('search.findImage')
+    def findImage(self, imageName, threshold = 0.8, region = None, searchMode = None):
         """
-        Checks if the passed image is found on the screen returns the co-ordinates of its centre point if found, else returns an error msg
+        Checks if the passed image is found on the current frame and returns the co-ordinates of its centre point if found, else returns an error msg
         
          Parameters:
         imageName (str): The filename of the image to find on the screen
         threshold (float): The tolerance amount between 0 and 1 representing the similarity threshold. The higher the threshold, the stricter the match.
+        region (optional tuple of ints): The (x, y, width, height) area of the frame to search, None searches the whole frame (default = None)
+        searchMode (optional str): Either 'full' to match at full resolution or 'pyramid' to find the template at half resolution and 
+        then refine it at full resolution around that location (default = None, uses self.searchMode)
         """
 
-        # Checks if the image exists in the loaded image list
-        if imageName in self.imageList:
+        # Lazily loads templates that are in the image list but have not been loaded into the template store yet
+        if imageName in self.imageList and imageName not in self.templateStore:
+            self.templateStore.addTemplate(imageName)
+
+        # Checks if the image exists in the template store
+        if imageName in self.templateStore:
+            
+            # Fetches the template along with the domain it should be matched in
+            mode, imageToFind = self.templateStore.getTemplate(imageName)
+            templateHeight, templateWidth = imageToFind.shape[:2]
+            # Drops a frame that is not held by a tick so that this search captures a fresh one
+            self.__dropStaleFrame()
             
-            # Loads the image to find on the screen
-            template = os.path.join(self.imageFolder, imageName)
-            imageToFind = cv2.imread(template)
+            # Fetches the shared frame of the same domain, returning early if there are no frames left to search
+            frame = self.getFrame(mode)
+            if frame is None:
+                return
+            # Crops the frame to the search region if one was passed
+            regionX, regionY = (region[0], region[1]) if region else (0, 0)
+            if region:
+                frame = frame[regionY:regionY + region[3], regionX:regionX + region[2]]
             
-            # Takes a screen shot of the screen to compare against the imageToFind
-            screenshot = np.array(pyautogui.screenshot())
-            # Converts the screenshot to BGR color format
-            convertedScreenshot = cv2.cvtColor(screenshot, cv2.COLOR_RGB2BGR)
+            # Returns early if the template does not fit inside the searched area
+            if frame.shape[0] < templateHeight or frame.shape[1] < templateWidth:
+                return
             
-            # Match the template
-            result = cv2.matchTemplate(convertedScreenshot, imageToFind, cv2.TM_CCOEFF_NORMED)
-            minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result)
+            # Uses a pyramid search if requested and the template is large enough to survive being downscaled
+            if (searchMode or self.searchMode) == 'pyramid' and min(templateHeight, templateWidth) >= 16:
+                
+                # Finds the rough location of the template on the half resolution frame
+                smallFrame = self.getFrame(mode, pyramid = True)
+                if region:
+                    smallFrame = smallFrame[regionY // 2:(regionY + region[3]) // 2, regionX // 2:(regionX + region[2]) // 2]
+                with Debugger.span('search.matchTemplate'):
+                    result = cv2.matchTemplate(smallFrame, self.__pyramidTemplate(imageName, mode, imageToFind), cv2.TM_CCOEFF_NORMED)
+                    minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result)
+                
+                # Returns early if there is no rough match, allowing some tolerance since downscaling blurs the match
+                if maxVal < threshold * 0.9:
+                    return
+                
+                # Refines the match at full resolution within a small window around the rough location
+                margin = 4
+                windowX = max(0, maxLoc[0] * 2 - margin)
+                windowY = max(0, maxLoc[1] * 2 - margin)
+                window = frame[windowY:windowY + templateHeight + 2 * margin, windowX:windowX + templateWidth + 2 * margin]
+                with Debugger.span('search.matchTemplate'):
+                    result = cv2.matchTemplate(window, imageToFind, cv2.TM_CCOEFF_NORMED)
+                    minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result)
+                maxLoc = (maxLoc[0] + windowX, maxLoc[1] + windowY)
+            
+            else:
+                
+                # Match the template against the shared frame of the same domain
+                with Debugger.span('search.matchTemplate'):
+                    result = cv2.matchTemplate(frame, imageToFind, cv2.TM_CCOEFF_NORMED)
+                    minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result)
             
             if maxVal >= threshold:
-                # Get the center of the found image
-                centreX = maxLoc[0] + imageToFind.shape[1] // 2
-                centreY = maxLoc[1] + imageToFind.shape[0] // 2
+                # Get the center of the found image in screen coordinates
+                centreX = self.captureOffset[0] + regionX + maxLoc[0] + templateWidth // 2
+                centreY = self.captureOffset[1] + regionY + maxLoc[1] + templateHeight // 2
                 # Returns the pixel location of the found 
                 return Point(centreX, centreY)
         
         else:
-            # Else if passed image file name is not found in the image directory, writes error to console and returns None
-            print('Failed to find the passed image filename in the image directory!')
+            # Else if passed image file name is not found in the image directory, logs a warning and returns None
+            Debugger.warning('Failed to find the passed image filename "{}" in the image directory!', imageName)
+
+
+    @Debugger.timed('search.findImages')
+    def findImages(self, pool, imageNames, threshold = 0.8, region = None):
+        """
+        Searches the current frame for every passed image at once on the worker processes of the passed vision pool, the
+        frame is published to shared memory once per matching domain and each worker is only sent its handle and the region
+
+         Parameters:
+        - pool (VisionPool): The pool of worker processes to search on
+        - imageNames (list of str): The filenames of the images to find
+        - threshold (optional float): The similarity between 0 and 1 that a match must reach (default = 0.8)
+        - region (optional tuple of ints): The (x, y, width, height) area of the frame to search (default = None, searches the whole frame)
+
+         Returns:
+        - A dictionary mapping each image filename to the Point of its centre in screen coordinates, or None if it was not found
+        """
+
+        # Imports the template matching job only when a vision pool is used, so the headless search path never imports the process pool
+        from VisionPool import matchTemplateJob
+
+        # Stores the result of every image in the order they were passed, images that are not searched for stay None
+        futures, results = {}, dict.fromkeys(imageNames)
+        # Drops a frame that is not held by a tick so that these searches capture a fresh one
+        self.__dropStaleFrame()
+
+        # Returns no matches if there are no frames left to search
+        if self.getFrame() is None:
+            return results
+
+        # Stores the templates to search for in each matching domain
+        domains = {}
+
+        for imageName in imageNames:
+
+            # Lazily loads templates that are in the image list but have not been loaded into the template store yet
+            if imageName in self.imageList and imageName not in self.templateStore:
+                self.templateStore.addTemplate(imageName)
+
+            # Skips images that are not in the template store
+            if imageName not in self.templateStore:
+                continue
+
+            # Groups the templates by the domain they are matched in
+            mode, imageToFind = self.templateStore.getTemplate(imageName)
+            domains.setdefault(mode, []).append((imageName, imageToFind))
+
+        # Publishes the frame once per domain and submits every search in that domain on it, releasing the frame after its
+        # last search so that only one frame is reserved at a time and later domains can reuse the slots of earlier ones
+        for mode, templates in domains.items():
+
+            handle = pool.publish(self.getFrame(mode), self.frameId)
+
+            try:
+                for imageName, imageToFind in templates:
+                    futures[imageName] = pool.submit(matchTemplateJob, handle, region, imageToFind, threshold)
+            finally:
+                pool.release(handle)
+
+        regionX, regionY = (region[0], region[1]) if region else (0, 0)
+
+        # Converts each match from region coordinates into screen coordinates as it completes
+        for imageName, future in futures.items():
+            match = future.result()
+            results[imageName] = None if match is None else Point(self.captureOffset[0] + regionX + match[0][0], self.captureOffset[1] + regionY + match[0][1])
+
+        return results
+
+
+    def __dropStaleFrame(self):
+        """
+        Drops the current frame if no tick or caller of captureFrame() is holding it, so searches made outside of a tick
+        each capture a fresh frame as they did before frames were shared.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        if not self.frameHeld:
+            self.frames = {}
+
+
+    def __pyramidTemplate(self, imageName, mode, imageToFind):
+        """
+        Returns the half resolution version of the passed template, downscaling it only the first time it is requested.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        # Downscales the template if it has not been downscaled in this domain yet
+        if (imageName, mode) not in self.pyramidTemplates:
+            self.pyramidTemplates[(imageName, mode)] = cv2.pyrDown(imageToFind)
+
+        return self.pyramidTemplates[(imageName, mode)]
             
     
     def findPixelByColor(self, targetColor, searchX = None, searchY = None, searchWidth = None, searchHeight = None):
@@ -71,6 +379,9 @@ class SearchManager():
         Returns the location of the first found pixel matching the passed color, either on the whole screen or within a passed search area
         """
 
+        # Imports pyautogui only when a pixel is searched for since importing it probes the display
+        import pyautogui
+
         # If no positional parameters were passed
         if searchX is None or searchY is None:
             # Sets the left corner of the search area to the top left corner of the screen
@@ -107,6 +418,10 @@ class SearchManager():
         Returns the color of the pixel at the passed x and y coordinates or at the current mouse position if no x and y coordinates are passed
         """
 
+        # Imports pyautogui and pillow only when a pixel color is read since importing them probes the display
+        import pyautogui
+        from PIL import ImageGrab
+
         # If no coordinates were passed
         if x is None and y is None:
            # Sets coordinates to match the current mouse position
@@ -0,0 +1,124 @@
+# Imports the thread pool which runs every session's script concurrently
+from concurrent.futures import ThreadPoolExecutor
+# Imports window manager class to find every luna client and watch their geometry
+from WindowManager import WindowManager, GeometryWatcher
+# Imports the script manager class which each session drives its client through
+from scriptManager import ScriptManager
+# Imports the shared capture so that one screenshot per tick serves every session
+from FrameSource import SharedScreenCapture
+# Imports the input backend and fair lock which every session shares the mouse through
+from InputBackend import PyAutoGuiBackend, FairLock
+
+
+class Session():
+    """
+    Class that binds a single luna client to its own script manager, capture region, overlay and input lane
+    """
+
+
+    def __init__(self, sessionId, lunaClient, capture, inputBackend, inputLock, debugMode = False, cpuBudget = None):
+        """
+        Initializes the Session() class
+
+         Parameters:
+        - sessionId (int): The index of this session
+        - lunaClient (Win32Window): The client this session drives
+        - capture (SharedScreenCapture): The shared capture this session reads its client region from
+        - inputBackend (InputBackend): The input backend shared by every session
+        - inputLock (FairLock): The lock every session takes turns with the shared mouse through
+        - debugMode (optional bool): True if debug messages should be written to the console (default = False)
+        - cpuBudget (optional float): The fraction of one CPU core this session may use (default = None, measure only)
+        """
+
+        self.sessionId = sessionId
+        self.lunaClient = lunaClient
+        # Creates this sessions frame source which reads only its clients region from the shared capture
+        self.frameSource = capture.view((lunaClient.left, lunaClient.top, lunaClient.width, lunaClient.height))
+        # Creates the script manager for this client, its overlay is created here so it lives on the GUI thread
+        self.script = ScriptManager(debugMode, lunaClient = lunaClient, inputBackend = inputBackend, frameSource = self.frameSource, inputLock = inputLock, cpuBudget = cpuBudget)
+        # Creates a geometry watcher for this client so its overlay, mouse bounds and capture region follow it
+        self.watcher = GeometryWatcher(lunaClient)
+        self.watcher.start()
+        self.watcher.subscribe(self.script._overlayManager.onWindowEvent)
+        self.watcher.subscribe(self.script._mouse.onWindowEvent)
+        self.watcher.subscribe(self.script._search.onWindowEvent)
+
+
+    def stop(self):
+        """
+        Stops this sessions geometry watcher and mouse action queue
+        """
+
+        self.watcher.stop()
+        self.script._mouse.actions.stop()
+
+
+class SessionManager():
+    """
+    Class that runs a session for every luna client on this host, all sessions share a single screen capture per tick and
+    take fair turns with the shared mouse
+    """
+
+
+    def __init__(self, debugMode = False, inputBackend = None, maxAge = 0.02, cpuBudget = None):
+        """
+        Initializes the SessionManager() class and creates a session for every running luna client
+
+         Parameters:
+        - debugMode (optional bool): True if debug messages should be written to the console (default = False)
+        - inputBackend (optional InputBackend): The input backend shared by every session (default = None, uses pyautogui)
+        - maxAge (optional float): The time in seconds that a shared capture is reused for (default = 0.02)
+        - cpuBudget (optional float): The fraction of one CPU core each session may use (default = None, measure only)
+        """
+
+        # Writes debug info to console
+        print('Initializing session manager...')
+        # Creates the shared capture, input backend and fair lock that every session uses
+        self.capture = SharedScreenCapture(maxAge)
+        self.inputBackend = inputBackend if inputBackend is not None else PyAutoGuiBackend()
+        self.inputLock = FairLock()
+        self.sessions = []
+        self.error = None
+
+        # Fetches every running luna client
+        self.error, lunaClients = WindowManager.getLunaClients()
+
+        # Creates a session for each client
+        for sessionId, lunaClient in enumerate(lunaClients):
+            self.sessions.append(Session(sessionId, lunaClient, self.capture, self.inputBackend, self.inputLock, debugMode, cpuBudget))
+
+        # Creates a thread pool with one worker per session
+        self._executor = ThreadPoolExecutor(max_workers = max(1, len(self.sessions)), thread_name_prefix = 'Session')
+
+
+    def run(self, script):
+        """
+        Runs the passed script once for every session on the thread pool
+
+         Parameters:
+        - script (callable): The bot script to run, this is passed the session's ScriptManager as its only argument
+
+         Returns:
+        - A list of futures, one for each session, that complete when that session's script returns
+        """
+
+        return [self._executor.submit(script, session.script) for session in self.sessions]
+
+
+    def utilization(self):
+        """
+        Returns a dictionary mapping each session id to its current CPU utilization, see CpuGovernor.stats() for more information
+        """
+
+        return {session.sessionId: session.script.utilization() for session in self.sessions}
+
+
+    def stop(self):
+        """
+        Stops every session and shuts the thread pool down
+        """
+
+        for session in self.sessions:
+            session.stop()
+
+        self._executor.shutdown(wait = False)
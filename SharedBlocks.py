@@ -0,0 +1,91 @@
+# Imports the shared memory class and the resource tracker which every process that creates or attaches to a block registers it with
+from multiprocessing import shared_memory, resource_tracker
+
+
+# Stores the shared memory blocks this process created and the blocks it has attached to, keyed by their name, so each block is only mapped once
+_owned = {}
+_attached = {}
+# Stores the blocks this process has unlinked, they stay mapped until the process exits since views into them may still be in use
+_retired = []
+# Stores whether this process shares the resource tracker of the process that created every block it attaches to, see shareOwnerTracker()
+_ownerTracked = False
+
+
+def shareOwnerTracker():
+    """
+    Marks this process as a worker started by the process that owns every block it attaches to, e.g. as the initializer of a
+    process pool. Such workers share their owners resource tracker, so they must leave the owners registration of each block in place
+    """
+
+    global _ownerTracked
+    _ownerTracked = True
+
+
+def attachShared(name):
+    """
+    Attaches to the shared memory block of the passed name without taking ownership of it, the block stays owned by and is
+    removed by the process that created it
+    """
+
+    # Returns the block itself if this process created it, attaching to it again would change its registration
+    if name in _owned:
+        return _owned[name]
+
+    # Reuses the block if this process has already attached to it
+    if name in _attached:
+        return _attached[name]
+
+    # Attaches without registering the block with this processes resource tracker, which would otherwise remove it when this process exits
+    try:
+        block = shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name = name)
+        # Removes the registration straight away, unless the tracker is shared with the owner and the registration is the owners
+        if not _ownerTracked:
+            resource_tracker.unregister(block._name, 'shared_memory')
+
+    _attached[name] = block
+    return block
+
+
+def createShared(name, size, replace = False):
+    """
+    Creates a shared memory block of the passed name and size that is owned by this process
+
+     Parameters:
+    - name (str or None): The name of the block, None generates a random name
+    - size (int): The size of the block in bytes
+    - replace (optional bool): True to replace an existing block of the same name, e.g. one left behind by a publisher that
+      crashed, processes still attached to the old block keep their own view of it (default = False, raises FileExistsError)
+
+     Returns:
+    - The created SharedMemory block
+    """
+
+    try:
+        block = shared_memory.SharedMemory(name = name, create = True, size = size)
+
+    # Removes the existing block and creates the block again if the caller opted in, else lets the error reach the caller
+    except FileExistsError:
+
+        if not replace:
+            raise
+
+        stale = shared_memory.SharedMemory(name = name)
+        stale.close()
+        stale.unlink()
+        block = shared_memory.SharedMemory(name = name, create = True, size = size)
+
+    _owned[block.name] = block
+    return block
+
+
+def unlinkShared(block):
+    """
+    Removes a block this process created so that no further process can attach to it. The block stays mapped in this
+    process, since unmapping it while numpy views into it are still in use would crash the process
+    """
+
+    _owned.pop(block.name, None)
+    _retired.append(block)
+    block.unlink()
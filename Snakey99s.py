@@ -0,0 +1,116 @@
+# Imports only the standard libraries needed to parse the command line, every bot module is imported when it is first needed
+import os
+import sys
+import time
+import argparse
+import importlib
+
+
+# Defines the modules that the headless vision path needs, in the order they are imported
+visionModules = ('FrameSource', 'TemplateStore', 'SearchManager')
+# Defines the GUI and desktop modules that the headless vision path should never import
+guiModules = ('PyQt5', 'pyautogui', 'pygetwindow', 'PIL')
+
+
+def measureStartup():
+    """
+    Imports the headless vision path and measures how long each of its modules takes to import, this should be run in a
+    fresh interpreter since modules that have already been imported are not imported again
+
+     Returns:
+    - A dictionary of the total import time in milliseconds, the import time of each vision module and any GUI modules that were imported
+    """
+
+    startTime = time.perf_counter()
+    moduleTimes = {}
+
+    # Imports each vision module in turn, timing it along with any heavy modules it is the first to import
+    for moduleName in visionModules:
+        moduleStart = time.perf_counter()
+        importlib.import_module(moduleName)
+        moduleTimes[moduleName] = 1000 * (time.perf_counter() - moduleStart)
+
+    return {
+        'importMs': 1000 * (time.perf_counter() - startTime),
+        'modules': moduleTimes,
+        'guiModulesLoaded': [moduleName for moduleName in guiModules if moduleName in sys.modules],
+    }
+
+
+def searchRecorded(frames, templates, threshold = 0.8, mode = 'color'):
+    """
+    Searches every recorded frame for every passed template without a display, a GUI toolkit or a game client
+
+     Parameters:
+    - frames (str): The directory of recorded frame images to search
+    - templates (list of str): The file paths of the template images to find
+    - threshold (optional float): The similarity between 0 and 1 that a match must reach (default = 0.8)
+    - mode (optional str): The domain to match the templates in, either 'color', 'gray' or 'edge' (default = 'color')
+
+     Returns:
+    - A list of (frame ID, template name, Point or None) tuples, one for each template on each frame
+    """
+
+    from SearchManager import SearchManager
+    from FrameSource import RecordedFrameSource
+
+    search = SearchManager(RecordedFrameSource(frames, loop = False))
+    results = []
+
+    # Loads each template from its own folder, keyed by its filename
+    for template in templates:
+        search.templateStore.imageFolder = os.path.dirname(template) or '.'
+        error = search.templateStore.addTemplate(os.path.basename(template), mode)
+        if error:
+            print(error)
+
+    # Searches each recorded frame until every frame has been searched
+    while search.captureFrame():
+        for template in templates:
+            imageName = os.path.basename(template)
+            if imageName in search.templateStore:
+                results.append((search.frameId, imageName, search.findImage(imageName, threshold)))
+
+    return results
+
+
+def main(argv = None):
+    """
+    Runs the command passed on the command line:
+
+    - startup: Prints how long the headless vision path takes to import and whether it imported any GUI modules
+    - search FRAMES TEMPLATE [TEMPLATE ...]: Searches a directory of recorded frames for the passed templates headless
+    """
+
+    parser = argparse.ArgumentParser(prog = 'Snakey99s', description = 'Runs the Snakey99s bot components headless from the command line')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    commands.add_parser('startup', help = 'measure the import time of the headless vision path')
+    searchParser = commands.add_parser('search', help = 'search recorded frames for templates without a display')
+    searchParser.add_argument('frames', help = 'the directory of recorded frame images')
+    searchParser.add_argument('templates', nargs = '+', help = 'the template images to find')
+    searchParser.add_argument('--threshold', type = float, default = 0.8, help = 'the similarity a match must reach (default = 0.8)')
+    searchParser.add_argument('--mode', choices = ('color', 'gray', 'edge'), default = 'color', help = 'the domain to match in (default = color)')
+    args = parser.parse_args(argv)
+
+    # Measures the startup of the headless vision path
+    if args.command == 'startup':
+        stats = measureStartup()
+        print(f"Headless vision path imported in {stats['importMs']:.0f}ms")
+        for moduleName, moduleTime in stats['modules'].items():
+            print(f'  {moduleName}: {moduleTime:.0f}ms')
+        print(f"GUI modules imported: {', '.join(stats['guiModulesLoaded']) or 'none'}")
+        return 1 if stats['guiModulesLoaded'] else 0
+
+    # Searches the recorded frames, printing every template found
+    startTime = time.perf_counter()
+    results = searchRecorded(args.frames, args.templates, args.threshold, args.mode)
+    for frameId, imageName, point in results:
+        if point is not None:
+            print(f'Frame {frameId}: found {imageName} at {point.x}, {point.y}')
+    print(f'Searched {len(results)} template/frame pairs in {1000 * (time.perf_counter() - startTime):.0f}ms')
+    return 0
+
+
+# Runs the passed command if this file is executed directly (rather than being imported as a module)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# Imports the time library to measure how long the frame has been static
+import time
+import cv2
+import numpy as np
+
+
+class StallDetector():
+    """
+    Class that tracks how often the client frame changes using a cheap downsampled hash, so that capturing and searching
+    can back off while the client is loading, minimized or frozen and ramp back up the moment its pixels change
+    """
+
+
+    def __init__(self, idleAfter = 1.0, maxInterval = 0.5, unresponsiveAfter = 10.0, stride = 4, tolerance = 8):
+        """
+        Initializes the StallDetector() class
+
+         Parameters:
+        - idleAfter (optional float): The time in seconds that the frame must stay static before the poll rate starts backing off (default = 1.0)
+        - maxInterval (optional float): The longest time in seconds between polls while the frame is static (default = 0.5)
+        - unresponsiveAfter (optional float): The time in seconds that the frame must stay static before the client is considered unresponsive (default = 10.0)
+        - stride (optional int): Only every stride-th pixel of the frame is hashed, lower strides notice smaller changes (default = 4)
+        - tolerance (optional int): The difference in gray levels that any one hashed pixel must exceed for the frame to count as changed,
+          raise it for noisy frames such as recorded video (default = 8)
+        """
+
+        self.idleAfter = idleAfter
+        self.maxInterval = maxInterval
+        self.unresponsiveAfter = unresponsiveAfter
+        self.stride = stride
+        self.tolerance = tolerance
+        # Stores the hash of the previous frame
+        self.lastHash = None
+        # Stores the time the frame last changed
+        self.lastChange = time.monotonic()
+        # Stores whether the most recent frame changed and an exponential moving average of the change rate
+        self.changed = True
+        self.changeRate = 1.0
+
+
+    def frameHash(self, frame):
+        """
+        Returns a grayscale thumbnail of every stride-th pixel of the passed frame, which is much cheaper to compare than the frame itself.
+        The pixels are sampled rather than averaged so that a small change such as a moving cursor is not blurred away
+        """
+
+        # Subsamples the frame so that the full frame is never read
+        thumbnail = np.ascontiguousarray(frame[::self.stride, ::self.stride])
+
+        # Converts the thumbnail to a single channel if it is a color frame
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+        return thumbnail.astype(np.int16)
+
+
+    def update(self, frame):
+        """
+        Hashes the passed frame and records whether it changed since the previous frame
+
+         Parameters:
+        - frame (numpy array): The frame captured this tick
+
+         Returns:
+        - True if the frame changed, else returns false
+        """
+
+        frameHash = self.frameHash(frame)
+
+        # Compares the new hash with the previous one pixel by pixel, so a small local change such as a ticking counter is not averaged away
+        self.changed = self.lastHash is None or frameHash.shape != self.lastHash.shape or bool((np.abs(frameHash - self.lastHash) > self.tolerance).any())
+        self.lastHash = frameHash
+
+        # Resets the static timer the moment the frame changes
+        if self.changed:
+            self.lastChange = time.monotonic()
+
+        # Updates the moving average of how often the frame changes
+        self.changeRate = 0.9 * self.changeRate + 0.1 * self.changed
+        return self.changed
+
+
+    def staticFor(self):
+        """
+        Returns the time in seconds since the frame last changed
+        """
+
+        return time.monotonic() - self.lastChange
+
+
+    def pollInterval(self, baseInterval):
+        """
+        Returns the time in seconds to wait before the next poll, this is the passed base interval while the frame is changing
+        and doubles for every idleAfter seconds that the frame stays static, up to maxInterval
+
+         Parameters:
+        - baseInterval (float): The time in seconds between polls while the frame is changing
+        """
+
+        staticFor = self.staticFor()
+
+        # Polls at the full rate while the frame is changing, or straight after it changes
+        if self.changed or staticFor < self.idleAfter:
+            return baseInterval
+
+        # Backs off exponentially the longer the frame stays static
+        doublings = min(16, int(staticFor / max(self.idleAfter, 0.001)))
+        return min(self.maxInterval, max(baseInterval, 0.01) * 2 ** doublings)
+
+
+    def isIdle(self):
+        """
+        Returns true if the frame has been static for long enough that polling has backed off
+        """
+
+        return not self.changed and self.staticFor() >= self.idleAfter
+
+
+    def isUnresponsive(self):
+        """
+        Returns true if the frame has been static for so long that the client is likely frozen
+        """
+
+        return self.staticFor() >= self.unresponsiveAfter
@@ -0,0 +1,223 @@
+# Imports os library to build the paths of the template images
+import os
+import json
+import cv2
+import numpy as np
+# Imports the shared memory helpers which create and remove the blocks this process owns, and attach to a block without taking ownership of it
+from SharedBlocks import attachShared, createShared, unlinkShared
+
+
+class TemplateStore():
+    """
+    Class that loads and stores every template image used by the SearchManager, each template is stored in the
+    matching domain (color, grayscale or edge map) that was selected for it so it never needs to be converted again
+    """
+
+    # Defines the matching domains that a template can be stored and matched in
+    validModes = ('color', 'gray', 'edge')
+
+
+    def __init__(self, imageFolder = os.path.join('screens'), cannyLow = 50, cannyHigh = 150):
+        """
+        Initializes the TemplateStore() class
+
+         Parameters:
+        - imageFolder (optional str): The folder that the template images are loaded from (default = 'screens')
+        - cannyLow, cannyHigh (optional ints): The hysteresis thresholds used when converting an image into an edge map (default = 50, 150)
+        """
+
+        # Stores the folder that template images are loaded from
+        self.imageFolder = imageFolder
+        # Stores the canny thresholds so that frames and templates are converted into identical edge maps
+        self.cannyLow, self.cannyHigh = cannyLow, cannyHigh
+        # Maps each template name to a tuple of its matching mode and its converted image
+        self.templates = {}
+        # Stores the shared memory block that the templates were published to or attached from (if any), and whether this store created it
+        self.sharedBlock = None
+        self.ownsBlock = False
+
+
+    @classmethod
+    def attach(cls, blockName, imageFolder = os.path.join('screens')):
+        """
+        Creates a template store from the templates another process published with publish(), the templates are read-only
+        views of the shared block so attaching costs no decoding and no memory per template. Templates added afterwards are
+        private to this process
+
+         Parameters:
+        - blockName (str): The name of the shared memory block passed to or returned by publish()
+        - imageFolder (optional str): The folder that any further templates are loaded from (default = 'screens')
+
+         Returns:
+        - The attached TemplateStore
+        """
+
+        block = attachShared(blockName)
+        # Reads the index of the block, which is stored after its 8 byte length
+        indexLength = int.from_bytes(block.buf[:8], 'little')
+        index = json.loads(bytes(block.buf[8:8 + indexLength]))
+
+        store = cls(imageFolder, index['cannyLow'], index['cannyHigh'])
+        store.sharedBlock = block
+        dataStart = cls.__dataStart(indexLength)
+
+        # Creates a read-only view of each template inside the block
+        for imageName, (mode, offset, shape, dtype) in index['templates'].items():
+            image = np.ndarray(shape, np.dtype(dtype), buffer = block.buf, offset = dataStart + offset)
+            image.flags.writeable = False
+            store.templates[imageName] = (mode, image)
+
+        return store
+
+
+    def publish(self, blockName = None, replace = False):
+        """
+        Copies every loaded template into a single shared memory block so that other bot processes on this host can attach
+        to them with TemplateStore.attach() instead of decoding and holding their own copies. This store then reads its
+        templates from the block too. The block is removed when this store is closed, so the publishing process should
+        outlive the processes attached to it
+
+         Parameters:
+        - blockName (optional str): The name to publish the block under, e.g. a name known to every bot process (default = None, a random name)
+        - replace (optional bool): True to replace an existing block of the same name, e.g. one left behind by a publisher that crashed
+          (default = False, raises FileExistsError if the name is taken)
+
+         Returns:
+        - The name of the shared memory block
+        """
+
+        # Releases any block this store published before, copying its templates back into private memory
+        self.close()
+        index, offset = {}, 0
+
+        # Lays every template out one after another, aligning each one to 64 bytes
+        for imageName, (mode, image) in self.templates.items():
+            index[imageName] = (mode, offset, image.shape, image.dtype.str)
+            offset += -(-image.nbytes // 64) * 64
+
+        # Writes the length of the index followed by the index itself, the templates start at the next 64 byte boundary after it
+        header = json.dumps({'cannyLow': self.cannyLow, 'cannyHigh': self.cannyHigh, 'templates': index}).encode()
+        dataStart = self.__dataStart(len(header))
+        block = createShared(blockName, dataStart + offset, replace)
+        block.buf[:8] = len(header).to_bytes(8, 'little')
+        block.buf[8:8 + len(header)] = header
+
+        # Copies each template into the block and replaces it with a read-only view of its copy
+        for imageName, (mode, start, shape, dtype) in index.items():
+            image = np.ndarray(shape, np.dtype(dtype), buffer = block.buf, offset = dataStart + start)
+            image[...] = self.templates[imageName][1]
+            image.flags.writeable = False
+            self.templates[imageName] = (mode, image)
+
+        self.sharedBlock, self.ownsBlock = block, True
+        return block.name
+
+
+    @staticmethod
+    def __dataStart(indexLength):
+        """
+        Returns the offset of the first template in a shared block whose index is the passed number of bytes long.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        return -(-(8 + indexLength) // 64) * 64
+
+
+    def close(self):
+        """
+        Detaches this store from its shared memory block, removing the block if this store published it
+        """
+
+        # Returns early if this store is not using a shared block
+        if self.sharedBlock is None:
+            return
+
+        # Only the publisher removes the block, the block stays mapped in this process so templates already handed out stay valid
+        if self.ownsBlock:
+            self.templates = {imageName: (mode, image.copy()) for imageName, (mode, image) in self.templates.items()}
+            unlinkShared(self.sharedBlock)
+
+        self.sharedBlock, self.ownsBlock = None, False
+
+
+    def addTemplate(self, imageName, mode = 'color'):
+        """
+        Loads the passed image from the image folder and stores it in the passed matching domain
+
+         Parameters:
+        - imageName (str): The filename of the template image relative to the image folder
+        - mode (optional str): The domain that this template should be matched in, either 'color', 'gray' or 'edge' (default = 'color')
+
+         Returns:
+        - An error message if the template could not be loaded, else returns None
+        """
+
+        # Ensures a valid matching mode was passed before loading anything
+        if mode not in self.validModes:
+            return (f'Invalid template mode \"{mode}\" was passed, valid modes are {self.validModes}')
+
+        # Loads the template image in BGR color format (the same format that the captured frames are converted to)
+        image = cv2.imread(os.path.join(self.imageFolder, imageName))
+
+        # If the image failed to load
+        if image is None:
+            return (f'Failed to load template image \"{imageName}\" from \"{self.imageFolder}\"!')
+
+        # Converts the template once and stores it alongside its mode
+        self.templates[imageName] = (mode, self.convert(image, mode))
+
+
+    def setMode(self, imageName, mode):
+        """
+        Changes the matching domain of an already loaded template by reloading it in the passed mode
+
+         Parameters:
+        - imageName (str): The filename of the template to change
+        - mode (str): The new matching domain, either 'color', 'gray' or 'edge'
+
+         Returns:
+        - An error message if the template could not be changed, else returns None
+        """
+
+        # Returns early if the template is already stored in the passed mode
+        if imageName in self.templates and self.templates[imageName][0] == mode:
+            return
+
+        # Reloads the template from disk so it is converted from the original color image
+        return self.addTemplate(imageName, mode)
+
+
+    def getTemplate(self, imageName):
+        """
+        Returns a tuple of the matching mode and converted image of the passed template, or None if it has not been loaded
+        """
+
+        return self.templates.get(imageName)
+
+
+    def __contains__(self, imageName):
+        """
+        Returns true if the passed template has been loaded into this store
+        """
+
+        return imageName in self.templates
+
+
+    def convert(self, image, mode):
+        """
+        Converts a BGR image into the passed matching domain
+
+         Parameters:
+        - image (numpy array): The BGR image to convert
+        - mode (str): The domain to convert the image into, either 'color', 'gray' or 'edge'
+        """
+
+        # Color templates are matched as they are
+        if mode == 'color':
+            return image
+
+        # Converts the image to a single channel which cuts the matching memory bandwidth by 3x
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        # Returns the grayscale image or its edge map which is much more robust to lighting changes
+        return gray if mode == 'gray' else cv2.Canny(gray, self.cannyLow, self.cannyHigh)
@@ -0,0 +1,147 @@
+# Imports the math library for the Fitts' law and distance calculations
+import math
+import random
+import time
+import numpy as np
+
+
+class TrajectoryEngine():
+    """
+    Class that generates human-like mouse paths as NumPy arrays and plays them back at a fixed rate. Each path follows a curved
+    Bezier route with a minimum-jerk speed profile and its duration is scaled to the distance travelled using Fitts' law
+    """
+
+
+    def __init__(self, rate = 125, fittsA = 0.025, fittsB = 0.06, minDuration = 0.02, maxDuration = 0.6, bucketSize = 25, curvature = 0.15, realtime = True):
+        """
+        Initializes the TrajectoryEngine() class
+
+         Parameters:
+        - rate (optional int): The number of cursor positions fed to the input per second (default = 125)
+        - fittsA, fittsB (optional floats): The Fitts' law intercept and slope in seconds (default = 0.025, 0.06)
+        - minDuration, maxDuration (optional floats): The shortest and longest time in seconds that a movement can take (default = 0.02, 0.6)
+        - bucketSize (optional int): The distance in pixels covered by each cached path template (default = 25)
+        - curvature (optional float): How far the path bows away from a straight line as a fraction of its length (default = 0.15)
+        - realtime (optional bool): False if paths should be played as fast as possible without waiting between steps, used for headless runs (default = True)
+        """
+
+        self.rate = rate
+        self.fittsA, self.fittsB = fittsA, fittsB
+        self.minDuration, self.maxDuration = minDuration, maxDuration
+        self.bucketSize = bucketSize
+        self.curvature = curvature
+        self.realtime = realtime
+        # Caches the unit path templates keyed by their distance bucket so common distances are only generated once
+        self.templates = {}
+
+
+    def duration(self, distance, targetWidth = 20):
+        """
+        Returns the time in seconds that a movement of the passed distance should take using Fitts' law
+
+         Parameters:
+        - distance (float): The distance in pixels being travelled
+        - targetWidth (optional float): The width in pixels of the target being moved to (default = 20)
+        """
+
+        # Calculates the Fitts' law movement time and clamps it to the allowed range
+        movementTime = self.fittsA + self.fittsB * math.log2(distance / max(targetWidth, 1) + 1)
+        return min(self.maxDuration, max(self.minDuration, movementTime))
+
+
+    def template(self, distance):
+        """
+        Returns the cached unit path template for the passed distance, generating it on first use. Templates run from (0, 0) to (1, 0)
+
+         Parameters:
+        - distance (float): The distance in pixels being travelled
+        """
+
+        # Rounds the distance into its bucket so that similar distances share a single template
+        bucket = max(1, int(round(distance / self.bucketSize)))
+
+        # Generates the template if this bucket has not been used yet
+        if bucket not in self.templates:
+
+            # Calculates the number of samples needed to play the movement at the fixed rate
+            samples = max(2, int(math.ceil(self.duration(bucket * self.bucketSize) * self.rate)) + 1)
+
+            # Applies the minimum-jerk profile so the cursor accelerates and decelerates smoothly
+            t = np.linspace(0.0, 1.0, samples)
+            s = 10 * t ** 3 - 15 * t ** 4 + 6 * t ** 5
+
+            # Evaluates a quadratic Bezier curve whose control point bows the path away from a straight line
+            control = np.array([0.5, self.curvature])
+            points = (2 * (1 - s) * s)[:, None] * control
+            points[:, 0] += s ** 2
+
+            self.templates[bucket] = points
+
+        return self.templates[bucket]
+
+
+    def path(self, start, end, targetWidth = 20):
+        """
+        Returns the path between the passed start and end positions as an (n, 2) NumPy array of cursor positions
+
+         Parameters:
+        - start, end (tuples of ints): The positions the movement starts and ends at
+        - targetWidth (optional float): The width in pixels of the target being moved to (default = 20)
+        """
+
+        # Calculates the vector between the start and end positions
+        start, end = np.asarray(start, dtype = float), np.asarray(end, dtype = float)
+        delta = end - start
+        distance = float(np.hypot(*delta))
+
+        # Returns a single point if the cursor is already at the end position
+        if distance < 1:
+            return end[None, :]
+
+        # Fetches the template, mirroring it at random so that movements do not always curve the same way
+        unit = self.template(distance) * np.array([1.0, random.choice((-1.0, 1.0))])
+
+        # Rotates and scales the unit template onto the actual movement
+        rotation = np.array([[delta[0], delta[1]], [-delta[1], delta[0]]])
+        points = start + unit @ rotation
+
+        # Snaps the last point exactly onto the end position
+        points[-1] = end
+        return points
+
+
+    def play(self, path, moveFunction, shouldStop = None):
+        """
+        Feeds each position of the passed path to the input at the fixed rate
+
+         Parameters:
+        - path (numpy array): The (n, 2) array of cursor positions to play
+        - moveFunction (callable): The function that moves the cursor to an x, y position, usually an input backends moveTo() method
+        - shouldStop (optional callable): Called before each step, playback stops early if it returns true
+
+         Returns:
+        - True if the whole path was played, else returns false if playback was stopped early
+        """
+
+        interval = 1.0 / self.rate
+        nextStep = time.perf_counter()
+
+        for x, y in path:
+
+            # Stops early if the caller requests it
+            if shouldStop is not None and shouldStop():
+                return False
+
+            moveFunction(int(round(x)), int(round(y)))
+
+            # Skips waiting between steps if this engine is not running in realtime
+            if not self.realtime:
+                continue
+
+            # Sleeps until the next step is due, scheduling against absolute deadlines so the rate does not drift
+            nextStep += interval
+            remaining = nextStep - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+        return True
@@ -0,0 +1,241 @@
+# Imports the process pool and shared memory which let vision jobs use every core without copying frames between processes
+from concurrent.futures import ProcessPoolExecutor
+import os
+from multiprocessing import shared_memory
+from collections import namedtuple
+import threading
+import cv2
+import numpy as np
+# Imports the helpers that attach worker processes to the shared frames without taking ownership of them
+from SharedBlocks import attachShared, shareOwnerTracker
+
+
+# Describes a frame held in shared memory, this is all that is sent to a worker process instead of the frame itself
+FrameHandle = namedtuple('FrameHandle', ['name', 'shape', 'dtype', 'frameId'])
+
+
+def frameFromHandle(handle, roi = None):
+    """
+    Returns a read-only numpy view of the frame described by the passed handle, no pixels are copied
+
+     Parameters:
+    - handle (FrameHandle): The handle of the frame
+    - roi (optional tuple of ints): The (x, y, width, height) area of the frame to return (default = None, the whole frame)
+    """
+
+    frame = np.ndarray(handle.shape, np.dtype(handle.dtype), buffer = attachShared(handle.name).buf)
+    frame.flags.writeable = False
+
+    # Crops the frame to the region of interest
+    if roi is not None:
+        x, y, width, height = roi
+        frame = frame[y:y + height, x:x + width]
+
+    return frame
+
+
+def _runJob(job, handle, roi, args):
+    """
+    Runs the passed vision job in a worker process on a view of the shared frame
+    """
+
+    return job(frameFromHandle(handle, roi), *args)
+
+
+def matchTemplateJob(frame, template, threshold = 0.8):
+    """
+    Vision job that matches the passed template against the frame
+
+     Parameters:
+    - frame (numpy array): The frame or region of interest to search, in the same domain as the template
+    - template (numpy array): The template to find
+    - threshold (optional float): The similarity between 0 and 1 that a match must reach (default = 0.8)
+
+     Returns:
+    - A tuple of the (x, y) centre of the best match within the frame and its score, or None if there was no match
+    """
+
+    # Returns early if the template does not fit inside the searched area
+    if frame.shape[0] < template.shape[0] or frame.shape[1] < template.shape[1]:
+        return
+
+    result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+    minVal, maxVal, minLoc, maxLoc = cv2.minMaxLoc(result)
+
+    if maxVal >= threshold:
+        return (maxLoc[0] + template.shape[1] // 2, maxLoc[1] + template.shape[0] // 2), maxVal
+
+
+class VisionPool():
+    """
+    Class that runs vision jobs on a pool of worker processes, so that work holding the GIL (e.g. ORB matching, blob
+    labeling or Python post-processing) can use every core. Each frame is written into shared memory once, and the workers
+    are sent only its handle and a region of interest, never the frame itself
+    """
+
+
+    def __init__(self, workers = None, slots = None):
+        """
+        Initializes the VisionPool() class
+
+         Parameters:
+        - workers (optional int): The number of worker processes (default = None, one per core)
+        - slots (optional int): The number of frames that can be held in shared memory at once, at least 2 (default = None, two more than the number of workers)
+        """
+
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        # Starts the workers as processes that share this processes resource tracker, so attaching leaves the frames registered to this pool
+        self._executor = ProcessPoolExecutor(max_workers = self.workers, initializer = shareOwnerTracker)
+        self.slots = max(2, slots if slots is not None else self.workers + 2)
+        # Stores the shared memory block of each slot and the number of unfinished jobs reading from it
+        self.blocks = [None] * self.slots
+        self.readers = [0] * self.slots
+        # Stores whether each slot is still reserved by publish(), the reservation is held until the caller calls release()
+        self.leases = [False] * self.slots
+        # Stores the slot written to last and the handle of the frame held in each slot
+        self.slot = 0
+        self.handles = [None] * self.slots
+        # Counts the frames published, and the frames that had to wait for a slot because every slot was still being read
+        self.published = self.waited = 0
+        self._condition = threading.Condition()
+
+
+    def publish(self, frame, frameId = None):
+        """
+        Copies the passed frame into shared memory so that jobs can be submitted on it, waiting for a free slot if every
+        slot is still being read by unfinished jobs. The slot stays reserved until release() is called, so the caller must
+        release every published frame once it has submitted its last job on it
+
+         Parameters:
+        - frame (numpy array): The frame to publish
+        - frameId (optional int): The ID of the frame (default = None, numbers the frames in the order they are published)
+
+         Returns:
+        - The FrameHandle of the published frame
+        """
+
+        with self._condition:
+
+            # Waits for a slot that no unfinished job is reading from, the slot of the latest frame is kept for its jobs
+            if not self.__freeSlots():
+                self.waited += 1
+                self._condition.wait_for(self.__freeSlots)
+
+            # Writes to the next free slot after the one written last, so the most recent frames are overwritten last
+            slot = self.slot = self.__freeSlots()[0]
+
+            # Reserves the slot so that no other publisher can write to it while the frame is copied in
+            self.readers[slot] += 1
+            self.leases[slot] = True
+
+            # Creates a new block for this slot if it has none yet or its block is too small for the frame
+            if self.blocks[slot] is None or self.blocks[slot].size < frame.nbytes:
+                if self.blocks[slot] is not None:
+                    self.blocks[slot].close()
+                    self.blocks[slot].unlink()
+                self.blocks[slot] = shared_memory.SharedMemory(create = True, size = frame.nbytes)
+
+            self.published += 1
+            handle = FrameHandle(self.blocks[slot].name, frame.shape, frame.dtype.str, self.published if frameId is None else frameId)
+            self.handles[slot] = handle
+
+        # Copies the frame into the slot, this is the only copy of the frame that is made
+        np.ndarray(frame.shape, frame.dtype, buffer = self.blocks[slot].buf)[...] = frame
+        return handle
+
+
+    def submit(self, job, handle, roi = None, *args):
+        """
+        Submits a vision job on a published frame
+
+         Parameters:
+        - job (callable): A module level function called in the worker process with a read-only view of the frame (cropped to the roi) followed by args
+        - handle (FrameHandle): The handle returned by publish()
+        - roi (optional tuple of ints): The (x, y, width, height) area of the frame that the job reads (default = None, the whole frame)
+        - args: Any further arguments to pass to the job, these are pickled so they should be small
+
+         Returns:
+        - A future that completes with the jobs result
+        """
+
+        with self._condition:
+
+            # Marks the slot as being read until the job finishes
+            slot = self.__slotOf(handle)
+            self.readers[slot] += 1
+
+        future = self._executor.submit(_runJob, job, handle, roi, args)
+        future.add_done_callback(lambda _: self.__release(slot))
+        return future
+
+
+    def release(self, handle):
+        """
+        Releases the reservation that publish() made on the passed frame, once every job has been submitted on it. The slot
+        is free to be overwritten as soon as these jobs finish
+
+         Parameters:
+        - handle (FrameHandle): The handle returned by publish()
+        """
+
+        with self._condition:
+
+            slot = self.__slotOf(handle)
+
+            # Returns early if the reservation has already been released
+            if not self.leases[slot]:
+                return
+
+            self.leases[slot] = False
+            self.readers[slot] -= 1
+            self._condition.notify_all()
+
+
+    def __slotOf(self, handle):
+        """
+        Returns the slot holding the frame of the passed handle, raising an error if the frame has since been overwritten.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        for slot, slotHandle in enumerate(self.handles):
+            if slotHandle == handle:
+                return slot
+
+        raise ValueError(f'Frame {handle.frameId} is no longer held in shared memory, it has been overwritten by a newer frame')
+
+
+    def __freeSlots(self):
+        """
+        Returns the slots that no unfinished job is reading from, in the order they should be written to, skipping the slot written last.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        order = [(self.slot + offset) % self.slots for offset in range(1, self.slots)]
+        return [slot for slot in order if self.readers[slot] == 0]
+
+
+    def __release(self, slot):
+        """
+        Marks one job reading from the passed slot as finished.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+
+        with self._condition:
+            self.readers[slot] -= 1
+            self._condition.notify_all()
+
+
+    def close(self):
+        """
+        Shuts the worker processes down and removes every shared memory block
+        """
+
+        self._executor.shutdown(wait = True, cancel_futures = True)
+
+        for block in self.blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+        self.blocks = [None] * self.slots
+        self.handles = [None] * self.slots
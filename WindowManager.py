@@ -1,17 +1,42 @@
-# Imports the pygetwindow class to check and manipulate the os's active windows
-import pygetwindow as apps
+# Imports the time and sys libraries to expire the cached client and check which operating system is running
+import time
+import sys
+import threading
+from collections import namedtuple
+# Imports the debugger class to time this classes hot paths while timing is enabled
+from Debugger import Debugger
+
+
+# Defines the event published by the geometry watcher whenever the luna client is moved, resized, focused or unfocused, and once the watcher stops
+GeometryEvent = namedtuple('GeometryEvent', ['kind', 'left', 'top', 'width', 'height', 'focused'])
 
 class WindowManager():
     """
     Class that handles window management such as checking the active windows, bringing the forward and maximizing them etc.,
     """
 
+    # Caches the resolved luna client so that the window list is only enumerated again once the cached client goes stale
+    _lunaClient = None
+    # Stores the time that the cached clients title was last checked
+    _lunaCheckedAt = 0.0
+    # The time in seconds between title checks of the cached client
+    clientTTL = 2.0
+    # Caches whether the luna client is the active window as a tuple of the time it was checked and the result
+    _lunaActive = (0.0, False)
+    # The time in seconds that the cached active window check is reused for
+    activeTTL = 0.25
+    # Stores the running geometry watcher (if any)
+    _watcher = None
+    
+
     @staticmethod
     def activeWindow():
         """
         Returns the current active window
         """
         
+        # Imports pygetwindow only when a window is first looked up since it is only needed on a desktop
+        import pygetwindow as apps
         return apps.getActiveWindow()
     
 
@@ -21,48 +46,127 @@ class WindowManager():
         Returns the current active windows title
         """
         
+        # Imports pygetwindow only when a window is first looked up since it is only needed on a desktop
+        import pygetwindow as apps
         return apps.getActiveWindowTitle()
     
 
     @staticmethod
+    @Debugger.timed('window.getLunaClient')
     def getLunaClient():
         """
-        Returns the active luna client if any exists, otherwise, calls the fetchLuna() function to attempt to fetch the first found instance of it
+        Returns the cached luna client if it is still valid, otherwise, calls the fetchLuna() function to attempt to fetch the first found instance of it
+        
+         Returns:
+        - A tuple of an error message (None if no error occured) and the luna client (None if no client could be found)
         """
         
-        # Get the currently active window using pygetwindow
-        activeWindow = WindowManager.activeWindow()
+        # Returns the cached client if it has not gone stale
+        if WindowManager.isClientValid(WindowManager._lunaClient):
+            return None, WindowManager._lunaClient
+        
+        # Else re-enumerates the active windows to fetch and cache a new luna client
+        return WindowManager.fetchLuna()
 
-        # Check if an active window exists and its title starts with 'Luna -'
-        if activeWindow and activeWindow.title.startswith('Luna - '):
-            # If the conditions are met, return the active Luna client
-            return ('Active instance of luna already exists, bypassing fetch method...'), activeWindow
+
+    @staticmethod
+    def isClientValid(client):
+        """
+        Cheaply checks whether the passed client is still a valid luna window. The window handle is checked every call 
+        while the title is only checked once every clientTTL seconds
         
-        # Else if no active luna window exists
-        else:
-            
-            # Calls the fetchluna method to return an error message (if any errors occur) along with the fetched lunaClient (if any is found)
-            return WindowManager.fetchLuna()
+         Parameters:
+        - client (Win32Window): The client to check
+        """
+        
+        # Returns false if there is no client to check
+        if client is None:
+            return False
+        
+        # Checks that the window handle still exists, this is a single cheap call on Windows
+        handle = getattr(client, '_hWnd', None)
+        if handle is not None and sys.platform.startswith('win'):
+            import ctypes
+            if not ctypes.windll.user32.IsWindow(handle):
+                return False
+        
+        # Checks the window title once the TTL has expired in case the handle has been reused by another window
+        if time.monotonic() - WindowManager._lunaCheckedAt > WindowManager.clientTTL:
+            try:
+                if not client.title.startswith('Luna'):
+                    return False
+            except Exception:
+                return False
+            WindowManager._lunaCheckedAt = time.monotonic()
+        
+        return True
+
 
     @staticmethod
+    def isClientHung(client = None):
+        """
+        Returns true if Windows reports that the passed client has stopped responding to messages, always returns false on other platforms
+        
+         Parameters:
+        - client (optional Win32Window): The client to check (default = None, checks the cached luna client)
+        """
+        
+        client = client if client is not None else WindowManager._lunaClient
+        handle = getattr(client, '_hWnd', None)
+        
+        # Asks user32 whether the window is hung, this is a single cheap call that does not wait on the window
+        if handle is not None and sys.platform.startswith('win'):
+            import ctypes
+            return bool(ctypes.windll.user32.IsHungAppWindow(handle))
+        
+        return False
+
+
+    @staticmethod
+    def invalidateLuna():
+        """
+        Clears the cached luna client so that it is fetched again on the next call to getLunaClient()
+        """
+        
+        WindowManager._lunaClient = None
+        WindowManager._lunaActive = (0.0, False)
+
+
+    @staticmethod
+    @Debugger.timed('window.lunaIsActive')
     def lunaIsActive():
         """
-        Returns true if luna is the current active window, else returns false
+        Returns true if luna is the current active window, else returns false. The result is reused for activeTTL seconds
         """
         
-        return WindowManager.getLunaClient() is not None
+        # Returns the focus state published by the geometry watcher if one is running
+        if WindowManager._watcher is not None and WindowManager._watcher.isRunning():
+            return WindowManager._watcher.focused
+        
+        # Returns the cached result if it has not expired yet
+        checkedAt, isActive = WindowManager._lunaActive
+        if time.monotonic() - checkedAt <= WindowManager.activeTTL:
+            return isActive
+        
+        # Compares the active window against the cached client by handle rather than fetching the client again
+        client = WindowManager._lunaClient
+        activeWindow = WindowManager.activeWindow()
+        isActive = client is not None and activeWindow is not None and getattr(activeWindow, '_hWnd', activeWindow) == getattr(client, '_hWnd', client)
+        
+        WindowManager._lunaActive = (time.monotonic(), isActive)
+        return isActive
     
 
     @staticmethod
     def checkLuna():
         """
-        Method that checks if the current active window is an instance of luna, if not, calls another method to handle its activation
+        Method that checks if there is a valid instance of luna, if not, calls another method to handle its activation
         """
         
-        # Returns early if the current active window is a Luna client
-        if WindowManager.getLunaClient() is not None:
+        # Returns early if the cached client is still a valid Luna client
+        if WindowManager.isClientValid(WindowManager._lunaClient):
             # Writes debug info to console
-            return ('Active instance of luna detected, fetch method will be bypassed...'), WindowManager.getLunaClient()
+            return ('Active instance of luna detected, fetch method will be bypassed...'), WindowManager._lunaClient
         
         # Else calls another method to fetch the first instance of Luna found in the active apps
         else:
@@ -70,7 +174,70 @@ class WindowManager():
             # Writes debug info directly to console
             print('Failed to find active instance of \"Luna\", attempting to fetch a client from active windows...')
             # Calls the fetch method to activate the first instance of Luna found in the active windows or return none with a debug message
-            return None, WindowManager.fetchLuna()
+            return WindowManager.fetchLuna()
+
+
+    @staticmethod
+    def startWatcher(client = None, interval = 0.25):
+        """
+        Starts a background watcher that publishes the geometry and focus changes of the luna client, if a watcher is already
+        running then it is returned instead
+        
+         Parameters:
+        - client (optional Win32Window): The client to watch (default = None, watches the cached luna client)
+        - interval (optional float): The time in seconds between each poll of the clients geometry (default = 0.25)
+        
+         Returns:
+        - The running GeometryWatcher() instance
+        """
+        
+        # Returns the watcher that is already running
+        if WindowManager._watcher is not None and WindowManager._watcher.isRunning():
+            return WindowManager._watcher
+        
+        # Creates and starts a new watcher for the passed or cached client
+        WindowManager._watcher = GeometryWatcher(client if client is not None else WindowManager._lunaClient, interval)
+        WindowManager._watcher.start()
+        return WindowManager._watcher
+
+
+    @staticmethod
+    def stopWatcher():
+        """
+        Stops the running geometry watcher (if any)
+        """
+        
+        if WindowManager._watcher is not None:
+            WindowManager._watcher.stop()
+            WindowManager._watcher = None
+
+
+    @staticmethod
+    def getLunaClients():
+        """
+        Returns every running instance of the luna client without activating or maximizing any of them
+        
+         Returns:
+        - A tuple of an error message (None if no error occured) and the list of luna clients (empty if none could be found)
+        """
+        
+        try:
+            # Imports pygetwindow only when the clients are first looked up since it is only needed on a desktop
+            import pygetwindow as apps
+            # Fetches all active instances of the Luna game client
+            lunaList = [window for window in apps.getAllWindows() if window.title.startswith("Luna")]
+            
+            # Returns an error if no instances of Luna.exe are found
+            if not lunaList:
+                return ("Failed to find any instances of the \"Luna\" game client! Please ensure there is an instance of \"Luna\" running before you launch a bot script."), []
+            
+            return None, lunaList
+        
+        # Catches any errors gracefully
+        except Exception as e:
+            
+            # Returns an informative error message
+            return (f'Error fetching luna clients: {e}'), []
 
 
     @staticmethod
@@ -81,6 +248,8 @@ class WindowManager():
         """
         
         try:
+            # Imports pygetwindow only when the clients are first looked up since it is only needed on a desktop
+            import pygetwindow as apps
             # Fetches all active instances of the Luna game client and stores them in a list
             lunaList = [window for window in apps.getAllWindows() if window.title.startswith("Luna")]
             
@@ -97,6 +266,10 @@ class WindowManager():
                 # Paints the transparent canvas that was just created
                 lunaClient.show()
                 
+                # Caches the fetched client so that the windows are not enumerated again until it goes stale
+                WindowManager._lunaClient = lunaClient
+                WindowManager._lunaCheckedAt = time.monotonic()
+                
                 # Returns the a debug message and the fetched luna client
                 return None, lunaClient
             
@@ -109,4 +282,174 @@ class WindowManager():
         except Exception as e:
             
             # Prints an informative error message to the console
-            return (f'Error displaying luna app: {e}'), None
\ No newline at end of file
+            return (f'Error displaying luna app: {e}'), None
+
+
+
+class GeometryWatcher():
+    """
+    Class that polls the geometry and focus state of a client on a background thread and publishes an event to every 
+    subscriber whenever it changes, so that no component needs to query the window system on its hot path
+    """
+
+
+    def __init__(self, client, interval = 0.25):
+        """
+        Initializes the GeometryWatcher() class
+        
+         Parameters:
+        - client (Win32Window): The client to watch
+        - interval (optional float): The time in seconds between each poll of the clients geometry (default = 0.25)
+        """
+        
+        self.client = client
+        self.interval = interval
+        # Stores the callbacks that are passed each GeometryEvent
+        self.subscribers = []
+        # Stores the last known geometry as a tuple of (left, top, width, height) and the last known focus state
+        self.geometry = None
+        self.focused = False
+        # Guards the subscriber list since subscribers can be added while the watcher is running
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread = None
+        # Uses the window handle directly on Windows since it is much cheaper than going through pygetwindow
+        self._handle = getattr(client, '_hWnd', None) if sys.platform.startswith('win') else None
+
+
+    def subscribe(self, callback):
+        """
+        Adds a callback that is passed a GeometryEvent whenever the client is moved, resized, focused or unfocused. The callback 
+        is called straight away with the current geometry so that subscribers never need to read it themselves
+        
+         Parameters:
+        - callback (callable): The function to call with each event, this is called from the watcher thread
+        """
+        
+        with self._lock:
+            self.subscribers.append(callback)
+        
+        # Publishes the current geometry to the new subscriber
+        if self.geometry is not None:
+            self.__publish(GeometryEvent('resized', *self.geometry, self.focused), [callback])
+
+
+    def unsubscribe(self, callback):
+        """
+        Removes a previously subscribed callback
+        """
+        
+        with self._lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+
+    def start(self):
+        """
+        Polls the clients geometry once and then starts polling it on a background thread
+        """
+        
+        self.poll()
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target = self._run, name = 'GeometryWatcher', daemon = True)
+        self._thread.start()
+
+
+    def stop(self):
+        """
+        Stops the background thread
+        """
+        
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join(timeout = 1)
+
+
+    def isRunning(self):
+        """
+        Returns true if the watcher thread is running
+        """
+        
+        return self._thread is not None and self._thread.is_alive()
+
+
+    @Debugger.timed('window.poll')
+    def poll(self):
+        """
+        Reads the clients current geometry and focus state and publishes an event for each change
+        """
+        
+        try:
+            geometry, focused = self._read()
+        
+        # Skips this poll if the client could not be read (it may be closing or minimized)
+        except Exception:
+            return
+        
+        events = []
+        
+        # Publishes a resized event if the size changed, else a moved event if only the position changed
+        if geometry != self.geometry:
+            resized = self.geometry is None or geometry[2:] != self.geometry[2:]
+            events.append(GeometryEvent('resized' if resized else 'moved', *geometry, focused))
+        
+        # Publishes a focus event if the client gained or lost focus
+        if focused != self.focused:
+            events.append(GeometryEvent('focus', *geometry, focused))
+        
+        self.geometry, self.focused = geometry, focused
+        
+        with self._lock:
+            subscribers = list(self.subscribers)
+        
+        for event in events:
+            self.__publish(event, subscribers)
+
+
+    def __publish(self, event, subscribers):
+        """
+        Passes the event to each of the passed subscribers, logging any subscriber that fails so that it can not stop the watcher.
+        This method has been __nameMangled to reduce accidental usage outside of this class
+        """
+        
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                Debugger.warning('Geometry watcher subscriber {} failed on a {} event: {}', getattr(callback, '__qualname__', callback), event.kind, e)
+
+
+    def _read(self):
+        """
+        Returns the clients geometry as a tuple of (left, top, width, height) along with its focus state
+        """
+        
+        # Reads the window rectangle and foreground window straight from user32 on Windows
+        if self._handle is not None:
+            import ctypes
+            from ctypes import wintypes
+            rect = wintypes.RECT()
+            ctypes.windll.user32.GetWindowRect(self._handle, ctypes.byref(rect))
+            focused = ctypes.windll.user32.GetForegroundWindow() == self._handle
+            return (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top), focused
+        
+        # Else falls back to pygetwindow
+        import pygetwindow as apps
+        activeWindow = apps.getActiveWindow()
+        return (self.client.left, self.client.top, self.client.width, self.client.height), activeWindow is not None and activeWindow == self.client
+
+
+    def _run(self):
+        """
+        Watcher thread loop that polls the client until the watcher is stopped, then publishes a 'stopped' event so that
+        subscribers stop relying on the watcher to keep their geometry up to date
+        """
+        
+        try:
+            while not self._stopEvent.wait(self.interval):
+                self.poll()
+        
+        finally:
+            with self._lock:
+                subscribers = list(self.subscribers)
+            self.__publish(GeometryEvent('stopped', *(self.geometry or (0, 0, 0, 0)), self.focused), subscribers)
@@ -1,6 +1,4 @@
-import pyautogui
 import numpy as np
-from PIL import ImageGrab
 
 def hex_to_rgb(hex_color):
     # Convert a hex color code to an RGB tuple
@@ -23,6 +21,10 @@ def find_and_move_to_color(color, step=10, threshold=30):
     find_and_move_to_color((0, 0, 0), step=10)
     find_and_move_to_color("#FF0000", step=10)
     """
+    # Imports pyautogui and pillow only when the screen is searched since importing them probes the display
+    import pyautogui
+    from PIL import ImageGrab
+
     # Get the screen size
     screen_width, screen_height = pyautogui.size()
 
@@ -51,9 +53,10 @@ def find_and_move_to_color(color, step=10, threshold=30):
 
     print(f"Color {color} not found on the screen.")
 
-# Example usage:
-# Pass RGB color
-find_and_move_to_color((0, 0, 0), step=10)
+# Example usage (only runs when this file is executed directly, so importing it has no side effects):
+if __name__ == '__main__':
+    # Pass RGB color
+    find_and_move_to_color((0, 0, 0), step=10)
 
-# Pass Hex color
-find_and_move_to_color("#000000", step=10)
+    # Pass Hex color
+    find_and_move_to_color("#000000", step=10)
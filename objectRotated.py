@@ -1,7 +1,5 @@
 import cv2
 import numpy as np
-import pyautogui
-from PIL import ImageGrab
 
 def detect_rotated_object(template_path, image_path):
     # Load the template and image
@@ -35,7 +33,8 @@ def detect_rotated_object(template_path, image_path):
     cv2.waitKey(0)
     cv2.destroyAllWindows()
 
-# Example usage
-template_path = 'path/to/template_image.png'
-image_path = 'path/to/rotated_image.png'
-detect_rotated_object(template_path, image_path)
+# Example usage (only runs when this file is executed directly, so importing it has no side effects)
+if __name__ == '__main__':
+    template_path = 'path/to/template_image.png'
+    image_path = 'path/to/rotated_image.png'
+    detect_rotated_object(template_path, image_path)
@@ -1,13 +1,20 @@
-# This is required to instantiate the OverlayManager class
-from PyQt5.QtWidgets import QApplication
 # Imports window manager class to check, access and manipulate active windows
 from WindowManager import WindowManager
-# Imports overlay manager to manage drawing rectangles and debug messages on top of the game client
-from OverlayManager import OverlayManager
 # Imports the debugger class to log error messages and handle raised exceptions
 from Debugger import Debugger
 # Imports the mouse manager class to handle automatic mouse movements/actions
 from MouseManager import MouseManager
+# Imports the search manager class to find templates and pixels on the captured frames
+from SearchManager import SearchManager
+# Imports the CPU governor which keeps this session within its CPU budget
+from CpuGovernor import CpuGovernor
+# Imports the stall detector which backs off capturing while the client frame is static
+from StallDetector import StallDetector
+# Imports the pipeline which overlaps capturing, searching and acting on separate threads
+from Pipeline import Pipeline
+# Imports the sampling profiler which can be switched on while a bot is running
+from Profiler import SamplingProfiler
+import atexit
 
 
 class ScriptManager():
@@ -23,25 +30,66 @@ class ScriptManager():
 
 
     
-    def __init__(self, debugMode = False):
+    def __init__(self, debugMode = False, lunaClient = None, inputBackend = None, frameSource = None, inputLock = None, cpuBudget = None, offscreen = False, templateStore = None, profile = False, stallTolerance = 8):
         """
         Initializes components required for writing scripts
+        
+         Parameters:
+        - debugMode (optional bool): True if debug messages should be written to the console (default = False)
+        - lunaClient (optional Win32Window): The client to apply the scripts to, any object with left, top, width and height attributes can be passed to run headless (default = None, fetches the active Luna client)
+        - inputBackend (optional InputBackend): The backend that every mouse event is sent through, pass a RecordingBackend() to run headless (default = None, uses pyautogui)
+        - frameSource (optional callable): The source that every frame is captured from, pass a RecordedFrameSource() to run headless (default = None, captures the screen)
+        - inputLock (optional FairLock): The lock shared by every session driving the same mouse (default = None, this session has the mouse to itself)
+        - cpuBudget (optional float): The fraction of one CPU core this session may use per tick before its workload is reduced (default = None, measure only)
+        - offscreen (optional bool): True if the overlay should be rendered into images instead of onto the screen, see OverlayManager.renderFrame() (default = False)
+        - templateStore (optional TemplateStore): The template store to search with, pass TemplateStore.attach(blockName) to share one published template set between bot processes (default = None, loads its own)
+        - profile (optional bool): True to sample every bot thread from startup until exit, writing flamegraph-ready stacks to 'profile.collapsed' (default = False)
+        - stallTolerance (optional int): The change in gray levels a sampled pixel must exceed for the client frame to count as changed, raise it for noisy frame sources (default = 8)
         """
         
         # Writes debug info to console if debugmode is enabled
         print('Initializing script manager...')
         # Enables/Disables debug mode instance attribute based on passed paramater
         self._debugMode = debugMode
-        # Sets the first found active instance of a luna client found in the active windows as an instance attribute, this is the client that the scripts will be applied to
-        debugMsg, self._lunaClient = WindowManager.getLunaClient()
-        # Checks if an error was raised
-        if debugMsg is not None:
-            # Prints any returned error messages
-            self.logError(debugMsg)
+        # Stores whether the client is managed through the window manager, injected clients are never checked against the window system
+        self._managedClient = lunaClient is None
+        
+        # Uses the passed client if one was given
+        if lunaClient is not None:
+            self._lunaClient = lunaClient
+        
+        # Else sets the first found active instance of a luna client found in the active windows as an instance attribute, this is the client that the scripts will be applied to
+        else:
+            debugMsg, self._lunaClient = WindowManager.getLunaClient()
+            # Checks if an error was raised
+            if debugMsg is not None:
+                # Prints any returned error messages
+                self.logError(debugMsg)
         # Creates an instance attribute for the overlay manager which will handle drawing overlays/debug messages to the client
-        self._overlayManager = OverlayManager(self._lunaClient)
+        # Imports the overlay manager only when a script manager is created, so importing this module does not load the GUI toolkit
+        from OverlayManager import OverlayManager
+        self._overlayManager = OverlayManager(self._lunaClient, offscreen = offscreen)
         # Creates an instance attribute for the mouse manager which will handle automated mouse movements/actions
-        self._mouse = MouseManager(self._lunaClient)
+        self._mouse = MouseManager(self._lunaClient, backend = inputBackend, inputLock = inputLock)
+        # Creates an instance attribute for the search manager which will handle finding templates on the captured frames
+        self._search = SearchManager(frameSource, templateStore)
+        # Creates the CPU governor which measures each tick and reduces the workload whenever this session goes over its budget
+        self._governor = CpuGovernor(cpuBudget)
+        # Creates the stall detector which tracks whether the client frame is changing
+        self._stall = StallDetector(tolerance = stallTolerance)
+        # Creates the sampling profiler, this only samples while a profile is running
+        self._profiler = SamplingProfiler()
+        self._profileAtExit = False
+        if profile:
+            self.profile(outputPath = 'profile.collapsed')
+        
+        # If the client is managed through the window manager, starts the geometry watcher so that the overlay, mouse bounds and 
+        # capture region follow the client without any of them querying the window system on their hot paths
+        if self._managedClient:
+            self._watcher = WindowManager.startWatcher(self._lunaClient)
+            self._watcher.subscribe(self._overlayManager.onWindowEvent)
+            self._watcher.subscribe(self._mouse.onWindowEvent)
+            self._watcher.subscribe(self._search.onWindowEvent)
 
 
     def debugMode(self, debugMode = None):
@@ -69,6 +117,155 @@ class ScriptManager():
     
     
     
+    def beginTick(self):
+        """
+        Marks the start of a tick, capturing a new frame unless the CPU governor is throttling the capture rate
+        """
+        
+        # Starts measuring this ticks CPU time
+        self._governor.beginTick()
+        # Applies the search mode chosen by the governor for this tick
+        self._search.searchMode = self._governor.searchMode()
+        
+        # Captures a new frame for this tick, or holds the previous one for this tick if captures are being throttled
+        if self._governor.shouldCapture() and self._search.captureFrame():
+            # Hashes the new frame to track whether the client is still changing
+            self._stall.update(self._search.getFrame())
+        elif self._search.frames:
+            self._search.frameHeld = True
+    
+    
+    def frameChanged(self):
+        """
+        Returns true if the frame captured this tick differs from the previous one, scripts can skip their searches while it does not
+        """
+        
+        return self._stall.changed
+    
+    
+    def nextTickDelay(self, baseInterval):
+        """
+        Returns the time in seconds to wait before the next tick, this is the passed base interval while the client frame is 
+        changing and backs off towards a low poll rate while it stays static
+        
+         Parameters:
+        - baseInterval (float): The time in seconds between ticks while the client frame is changing
+        """
+        
+        return self._stall.pollInterval(baseInterval)
+    
+    
+    def isClientStalled(self):
+        """
+        Returns true if the client frame has been static for too long or Windows reports that the client is not responding
+        """
+        
+        return self._stall.isUnresponsive() or (self._managedClient and WindowManager.isClientHung(self._lunaClient))
+    
+    
+    def endTick(self):
+        """
+        Marks the end of a tick so the CPU governor can measure it and adjust this sessions workload
+        """
+        
+        self._governor.endTick()
+        # Releases this ticks frame so that searches made between ticks capture a fresh frame
+        self._search.releaseFrame()
+        # Counts the tick towards a profile scoped to a number of ticks
+        if self._profiler.maxTicks is not None:
+            self._profiler.tick()
+    
+    
+    def shouldRun(self, priority = 'normal'):
+        """
+        Returns true if a check of the passed priority ('high', 'normal' or 'low') should run this tick, low priority checks
+        are deferred while this session is over its CPU budget
+        """
+        
+        return self._governor.shouldRun(priority)
+    
+    
+    def startRuntime(self, perceive, decide, act = None, tickRate = 10, adaptive = True, maxTicks = None):
+        """
+        Starts running this script as a loop of capture, perceive, decide and act ticks on a worker thread, so the GUI thread
+        only has to render the overlays. See BotRuntime() for more information on the parameters
+        
+         Returns:
+        - The started BotRuntime, call its stop() method to stop it or connect its finished signal to QApplication.quit. The 
+          overlay no longer quits the event loop once its messages expire, so the runtime keeps its overlays rendering
+        """
+        
+        # Stops the overlay from quitting the event loop while the runtime is still queueing work for it
+        self._overlayManager.autoClose = False
+        # Imports the bot runtime only when it is started since it runs on a Qt worker thread
+        from BotRuntime import BotRuntime
+        runtime = BotRuntime(self, perceive, decide, act, tickRate, adaptive, maxTicks)
+        runtime.start()
+        return runtime
+    
+    
+    def startPipeline(self, perceive, decide, act = None, workers = 2, captureRate = 30, adaptive = True, queueSize = 1):
+        """
+        Starts running this script as a pipeline of a capture thread, a pool of vision threads and an action thread, so the 
+        next frame is captured and searched while the previous one is acted on. See Pipeline() for more information on the parameters
+        
+         Returns:
+        - The started Pipeline, call its stop() method to stop it and its stats() method for its throughput and backpressure metrics.
+          The overlay no longer quits the event loop once its messages expire, so the caller quits it once the pipeline is stopped
+        """
+        
+        # Stops the overlay from quitting the event loop while the pipeline is still queueing work for it
+        self._overlayManager.autoClose = False
+        return Pipeline(self, perceive, decide, act, workers, captureRate, adaptive, queueSize).start()
+    
+    
+    def profile(self, enabled = True, duration = None, ticks = None, outputPath = None):
+        """
+        Starts or stops sampling every bot thread without restarting the bot. A profile writes collapsed stacks for
+        flamegraphs to the output path and logs its per-function totals when it finishes
+        
+         Parameters:
+        - enabled (optional bool): True to start a new profile, False to stop the running one (default = True)
+        - duration (optional float): The time in seconds to profile for (default = None)
+        - ticks (optional int): The number of ticks to profile for, counted by endTick() (default = None)
+        - outputPath (optional str): The file path to write the collapsed stacks to (default = None, only logs the totals)
+        
+         Returns:
+        - The sampling profiler, its functionTotals() and collapsed() methods can be read once it finishes
+        """
+        
+        # Stops the running profile, writing its output
+        if not enabled:
+            self._profiler.stop()
+            return self._profiler
+        
+        self._profiler.start(duration, ticks, outputPath)
+        
+        # Ensures a profile that is never stopped still writes its output when the bot exits, registering the stop only once
+        if duration is None and ticks is None and not self._profileAtExit:
+            atexit.register(self._profiler.stop)
+            self._profileAtExit = True
+        
+        return self._profiler
+    
+    
+    def utilization(self):
+        """
+        Returns this sessions current CPU utilization, budget and workload level, see CpuGovernor.stats() for more information
+        """
+        
+        return self._governor.stats()
+    
+    
+    def inputLatency(self):
+        """
+        Returns the input latency metrics of the mouse managers input backend, see InputBackend.latencyStats() for more information
+        """
+        
+        return self._mouse.backend.latencyStats()
+    
+    
+    
     """       -----------------------       """
     ##!         Window Manager Functions:        
     """       -----------------------       """
@@ -127,7 +324,7 @@ class ScriptManager():
             self.logError(colorError)
             
 
-    def drawDebug(self, debugMsg, drawDebug = True, delay = 1500):
+    def drawDebug(self, debugMsg, drawDebug = True, delay = 1500, priority = 0, key = None):
         """
         Paints debug info to the screen to inform the user of the action currently being undertaken by the bot
         
@@ -135,6 +332,11 @@ class ScriptManager():
         - debugMsg (str): The debug message to be displayed at the top of the game client to inform the user of the current process being performed
         - drawDebug (optional bool): False if this debug message should not be drawn to the screen, else true (default = True)
         - delay (optional int): The time in milliseconds before the overlay is automatically removed (default = 1500, None = Permanent)
+        - priority (optional int): Messages with a higher priority are displayed before any lower priority messages (default = 0)
+        - key (optional hashable): If passed, this message replaces the previous message with the same key instead of queueing behind it (default = None)
+        
+         Returns:
+        - The entry ID of the queued debug message if it was drawn, else returns None
         """
         
         try:
@@ -146,8 +348,8 @@ class ScriptManager():
             # Uses Debugger class to print messages to the console if debug mode is enabled
             self.debug(debugMsg)
             
-            # Ensures luna is still the active window before drawing overlays
-            if not WindowManager.lunaIsActive():
+            # Ensures luna is still the active window before drawing overlays (this is a cached check so it is cheap to call per message)
+            if self._managedClient and not WindowManager.lunaIsActive():
                 
                 # Fetches the first active instance of luna
                 getClientError, self._lunaClient = WindowManager.getLunaClient()
@@ -160,11 +362,13 @@ class ScriptManager():
             if drawDebug:
                 
                 # Runs the overlay managers add debug method to handle the debug drawing on-screen
-                debugError = self._overlayManager.addDebug(debugMsg, delay)
+                entryId = self._overlayManager.addDebug(debugMsg, delay, priority, key)
                 # If the debug function returns a fatal error
-                if debugError:
+                if isinstance(entryId, str):
                     # Logs the error to the console and exits
-                    self.logError(debugError)
+                    self.logError(entryId)
+                
+                return entryId
                 
         # Catches any errors gracefully
         except Exception as e:
@@ -190,7 +394,7 @@ class ScriptManager():
             self.logError(colorError)
 
 
-    def drawOverlay(self, overlayX = 0, overlayY = 0, overlayWidth = 200, overlayHeight = 200, overlayRows = 1, overlayColumns = 1, overlayThickness = 2, overlayDelay = 3000):
+    def drawOverlay(self, overlayX = 0, overlayY = 0, overlayWidth = 200, overlayHeight = 200, overlayRows = 1, overlayColumns = 1, overlayThickness = 2, overlayDelay = 3000, overlayId = None):
         """
         Adds a new overlay on top of the game client at the specified location and size for the specified amount of time
         
@@ -203,17 +407,24 @@ class ScriptManager():
         - overlayColumns (optional int): Number of columns in the grid layout of the overlay (default = 1)
         - overlayThickness (optional int): The thickness of the overlay border (default = 2)
         - overlayDelay (optional int): The time in milliseconds before the overlay automatically closes (default = 3000, None = Permanent)
+        - overlayId (optional hashable): The ID of the overlay, drawing an overlay with an existing ID replaces it (default = None, generates a new ID)
+        
+         Returns:
+        - The ID of the overlay which can be passed to clearOverlay() to remove it early
         """
         
         try:
             
             # Uses the overlay manager to add an overlay to the screen
-            overlayResult = self._overlayManager.addOverlay(overlayX, overlayY, overlayWidth, overlayHeight, overlayRows, overlayColumns, overlayThickness, overlayDelay)
+            overlayResult = self._overlayManager.addOverlay(overlayX, overlayY, overlayWidth, overlayHeight, overlayRows, overlayColumns, overlayThickness, overlayDelay, overlayId)
             
             # If the overlay manager returns an error
             if overlayResult:
                 # Logs the error
                 self.logError(overlayResult)
+            
+            # Returns the ID of the overlay that was just drawn
+            return self._overlayManager.lastOverlayId
 
         # Catches any errors gracefully
         except Exception as e:
@@ -223,21 +434,58 @@ class ScriptManager():
     
     
     
+    def clearOverlay(self, overlayId):
+        """
+        Removes the overlay with the passed ID from the screen before its delay expires
+        
+         Parameters:
+        - overlayId (hashable): The ID returned by drawOverlay()
+        """
+        
+        # Uses the overlay manager to remove the overlay group
+        clearError = self._overlayManager.clearOverlay(overlayId)
+        
+        # If the overlay manager returns an error
+        if clearError:
+            # Logs the error
+            self.logError(clearError)
+            
+    
+    def publishDetections(self, channel, boxes = None, scores = None, blobs = None, color = None):
+        """
+        Publishes a batch of detections to be drawn over the client, replacing the previous batch on the same channel.
+        Unlike drawOverlay() this is safe to call from any worker thread and never waits for the overlay to repaint
+        
+         Parameters:
+        - channel (str): The name of the channel, e.g. the template or detector that produced the batch
+        - boxes (optional array-like): An (n, 4) array of (x, y, width, height) boxes in client coordinates (default = None)
+        - scores (optional array-like): The n match scores of the boxes (default = None)
+        - blobs (optional array-like): An (m, 2) array of (x, y) blob centres in client coordinates (default = None)
+        - color (optional str): The color to draw this channel in (default = None, uses the overlay color)
+        """
+        
+        self._overlayManager.publishDetections(channel, boxes, scores, blobs, color)
+    
+    
+    
     """       ------------------       """
     ##!         Debugger Functions:         
     """       ------------------       """    
     
     
 
-    def debug(self, debugMsg):
+    def debug(self, debugMsg, *args):
         """
-        Calls the debugger class to write debug info to the console
+        Calls the debugger class to write debug info to the console, the message is only formatted if debug mode is enabled
+        
+         Parameters:
+        - debugMsg (str or callable): The debug message, formatted with str.format(*args) on the debuggers writer thread if any args are passed
         """
         
         # If this debug message should be drawn to the console too
         if self._debugMode:
-            # Uses Debugger class to print messages to the console
-            Debugger.debug(debugMsg)
+            # Uses Debugger class to queue the message for the console
+            Debugger.debug(debugMsg, *args)
 
 
     def logError(self, errorMsg):
@@ -248,14 +496,29 @@ class ScriptManager():
         - errorMsg (str): The error message to print to the console before exiting
         """
         
-        # Returns early if no error message has been provided to avoid calling debugger class for no reason
+        # Returns early if no error message has been provided, this only logs a warning since drawing it could fail and recurse back into logError
         if errorMsg is None:
-            self.drawDebug('Empty error message was passed to logger so the logError function has ignored it and returned early', False)
+            Debugger.warning('Empty error message was passed to logger so the logError function has ignored it and returned early')
             return
         
         # Sends debug message to debugging class to print error and exit
         Debugger.logError(f"Error: {errorMsg}")
         
+    
+    def timings(self, enabled = None):
+        """
+        Returns the timing summary of every hot path recorded so far, see Debugger.timingSummary() for more information
+        
+         Parameters:
+        - enabled (optional bool): True to start recording timings or False to stop recording them (default = None, leaves timing unchanged)
+        """
+        
+        # Enables or disables timing if requested
+        if enabled is not None:
+            Debugger.enableTiming(enabled)
+        
+        return Debugger.timingSummary()
+        
 
 
     """       --------------       """
@@ -276,6 +539,7 @@ async def __test():
         ### INITIALIZE COMPONENTS ###
         
         # Instantiates a QApplication for PyQt compatibility, otherwise, the eventLoop will not be able to execute
+        from PyQt5.QtWidgets import QApplication
         Overlay = QApplication([])
         # Instantiates the ScriptManager class with a test instance
         test = ScriptManager(debugMode=True)
@@ -88,6 +88,7 @@ class Worker(QThread):  # Defining a class named Worker which inherits from QThr
         self.text_signal.emit("Thread stopped")  # Emitting a signal indicating the thread is stopped
 
 
-app = QApplication([])  # Creating an instance of QApplication
-window = MainWindow()  # Creating an instance of MainWindow
-sys.exit(app.exec_())  # Executing the application event loop and exiting the program when it's done
+if __name__ == '__main__':  # Only runs the demo when this file is executed directly, so importing it has no side effects
+    app = QApplication([])  # Creating an instance of QApplication
+    window = MainWindow()  # Creating an instance of MainWindow
+    sys.exit(app.exec_())  # Executing the application event loop and exiting the program when it's done